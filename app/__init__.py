@@ -1,31 +1,24 @@
 import os
+import threading
 import warnings
 
+import click
 from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import HTTPException
 
-warnings.filterwarnings(
-    "ignore",
-    message=r"pkg_resources is deprecated as an API\..*",
-    category=UserWarning,
-    module=r"apscheduler(\..*)?",
-)
-
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.schedulers.base import STATE_RUNNING
-
 db = SQLAlchemy()
-migrate = Migrate()
 jwt = JWTManager()
-scheduler = BackgroundScheduler()
+# 下面两个按需创建：APScheduler（连带 pkg_resources）和 Flask-Migrate（连带 alembic）
+# 合计占了冷启动导入时间的三分之一，而 Web worker 一个都用不上。
+migrate = None
+scheduler = None
 
 
-def create_app(config_object=None):
+def create_app(config_object=None, with_scheduler=True):
     app = Flask(__name__)
     # load config
     if config_object:
@@ -35,6 +28,7 @@ def create_app(config_object=None):
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
         app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'change-me')
         app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 8 * 3600
+        app.config['DB_ENGINE_PROFILE'] = os.getenv('DB_ENGINE_PROFILE')
 
     # 初始化CORS，增强配置以支持预检请求和所有所需的HTTP方法
     CORS(app, resources={r"/api/*": {
@@ -52,8 +46,12 @@ def create_app(config_object=None):
         response.headers["Access-Control-Allow-Headers"] = "Origin, Content-Type, Authorization"
         return response
 
+    from .engine import configure_engine_options, install_engine_hooks
+
+    configure_engine_options(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    install_engine_hooks(app, db)
+    _init_migrate(app)
     jwt.init_app(app)
 
     from .utils import Response
@@ -86,6 +84,7 @@ def create_app(config_object=None):
     from .reports import bp as reports_bp
     from .categories import bp as categories_bp
     from .suppliers import bp as suppliers_bp
+    from .metrics import bp as metrics_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(products_bp, url_prefix='/api/products')
@@ -94,8 +93,15 @@ def create_app(config_object=None):
     app.register_blueprint(stock_bp, url_prefix='/api/stock')
     app.register_blueprint(orders_bp, url_prefix='/api/orders')
     app.register_blueprint(reports_bp, url_prefix='/api/reports')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+
+    from . import admission, compression
 
-    _init_scheduler(app)
+    admission.init_app(app)
+    compression.init_app(app)
+
+    if with_scheduler:
+        _init_scheduler(app)
 
     # 统一错误处理
     @app.errorhandler(Exception)
@@ -125,14 +131,63 @@ def create_app(config_object=None):
     return app
 
 
+def _init_migrate(app: Flask) -> None:
+    """只在 flask 命令行里挂 Flask-Migrate（`flask db ...` 需要它）。
+
+    flask CLI 是在 click 上下文里加载应用的；gunicorn、manage.py、测试都不是。
+    其他场景可用 MIGRATIONS_ENABLED 强制打开。
+    """
+    global migrate
+    if not (app.config.get('MIGRATIONS_ENABLED') or click.get_current_context(silent=True) is not None):
+        return
+
+    from flask_migrate import Migrate
+
+    if migrate is None:
+        migrate = Migrate()
+    migrate.init_app(app, db)
+
+
+def get_scheduler():
+    """首次使用时才导入 APScheduler 并创建后台调度器。"""
+    global scheduler
+    if scheduler is None:
+        warnings.filterwarnings(
+            "ignore",
+            message=r"pkg_resources is deprecated as an API\..*",
+            category=UserWarning,
+            module=r"apscheduler(\..*)?",
+        )
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        scheduler = BackgroundScheduler()
+    return scheduler
+
+
 def _init_scheduler(app: Flask) -> None:
     """初始化并启动定时任务（开发热重载下避免重复启动）。"""
+    if not app.config.get("SCHEDULER_ENABLED", True):
+        return
     # Flask debug reloader 会启动父/子两个进程；只在子进程里跑 scheduler。
     if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
         return
 
+    # 定时任务都是整点触发，晚几秒注册无所谓，别挡着第一个请求
+    delay = float(app.config.get("SCHEDULER_START_DELAY", 5))
+    if delay <= 0:
+        start_scheduler(app)
+        return
+    timer = threading.Timer(delay, start_scheduler, args=(app,))
+    timer.daemon = True
+    timer.start()
+
+
+def start_scheduler(app: Flask) -> None:
+    """注册定时任务并启动调度线程（多进程部署时只应在一个进程里调用）。"""
+    from apscheduler.schedulers.base import STATE_RUNNING
     from .reports import schedule_jobs
 
-    schedule_jobs(app)
-    if scheduler.state != STATE_RUNNING:
-        scheduler.start()
+    sched = get_scheduler()
+    schedule_jobs(app, sched)
+    if sched.state != STATE_RUNNING:
+        sched.start()
@@ -0,0 +1,165 @@
+"""准入控制：按接口的并发类别限制同一进程里同时执行的请求数，排不上的进有界队列。
+
+类别：
+- report：扫大量流水的报表（趋势、日报、估值、某时刻库存等），默认同时 2 个，最多排队 4 个、等 2 秒
+- write：所有写请求（POST/PUT/PATCH/DELETE，没单独标类别时默认归这里），只受进程总名额约束
+受控请求共用 ADMISSION_MAX_ACTIVE 个名额；名额空出来时按优先级放行，写请求排在报表前面，
+同一优先级先来先放。队列满了或等超时直接返回 503 + Retry-After，不占着线程和连接干等。
+接口用 @admission('report') 指定类别，@admission(None) 表示不受控；没标的 GET 不受控。
+指标：admission.<类别>.admitted / queued / rejected / timeouts、admission.<类别>.wait_seconds，
+瞬时值 admission 给出各类别的 active、waiting。
+"""
+import itertools
+import threading
+import time
+
+from flask import Flask, current_app, g, request
+
+from . import metrics
+from .utils import Response
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def admission(name):
+    """给单个接口指定并发类别，如 @admission('report')；@admission(None) 不受控。"""
+    def decorator(fn):
+        fn.admission = name
+        return fn
+    return decorator
+
+
+class _Class:
+    __slots__ = ('name', 'limit', 'queue', 'wait', 'priority', 'active', 'waiting')
+
+    def __init__(self, name, limit, queue, wait, priority):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.wait = wait
+        self.priority = priority
+        self.active = 0
+        self.waiting = 0
+
+
+class Gate:
+    def __init__(self, max_active: int, classes):
+        self.max_active = max_active
+        self.classes = {c.name: c for c in classes}
+        self.active = 0
+        self._cond = threading.Condition()
+        self._tickets = []  # 排队中的 (优先级, 序号, 类别)
+        self._seq = itertools.count()
+
+    def _runnable(self, cls: _Class) -> bool:
+        return self.active < self.max_active and (cls.limit is None or cls.active < cls.limit)
+
+    def _next(self):
+        """下一个该放行的票：按 (优先级, 序号) 找第一个自己类别还有空位的。"""
+        for ticket in sorted(self._tickets):
+            if self._runnable(ticket[2]):
+                return ticket
+        return None
+
+    def acquire(self, name: str):
+        """拿到名额返回 None；拿不到返回拒绝原因 'rejected'（队列满）或 'timeout'。"""
+        cls = self.classes[name]
+        started = time.monotonic()
+        with self._cond:
+            ticket = (cls.priority, next(self._seq), cls)
+            # 前面没有同级或更高优先级、且能放行的排队者时直接进
+            if self._runnable(cls) and not any(t[0] <= cls.priority and self._runnable(t[2]) for t in self._tickets):
+                self._grant(cls)
+                metrics.inc(f'admission.{name}.admitted')
+                return None
+            if cls.waiting >= cls.queue:
+                metrics.inc(f'admission.{name}.rejected')
+                return 'rejected'
+            self._tickets.append(ticket)
+            cls.waiting += 1
+            metrics.inc(f'admission.{name}.queued')
+            deadline = started + cls.wait
+            try:
+                while self._next() is not ticket:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.inc(f'admission.{name}.timeouts')
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self._grant(cls)
+            finally:
+                self._tickets.remove(ticket)
+                cls.waiting -= 1
+                # 自己出队后后面的票可能变成可放行的
+                self._cond.notify_all()
+        metrics.inc(f'admission.{name}.admitted')
+        metrics.observe(f'admission.{name}.wait_seconds', time.monotonic() - started)
+        return None
+
+    def _grant(self, cls: _Class) -> None:
+        cls.active += 1
+        self.active += 1
+
+    def release(self, name: str) -> None:
+        cls = self.classes[name]
+        with self._cond:
+            cls.active -= 1
+            self.active -= 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                'active': self.active,
+                'max_active': self.max_active,
+                **{c.name: {'active': c.active, 'waiting': c.waiting, 'limit': c.limit, 'queue': c.queue}
+                   for c in self.classes.values()},
+            }
+
+
+def _class_for_request(app: Flask):
+    if request.method == 'OPTIONS' or not request.endpoint:
+        return None
+    view = app.view_functions.get(request.endpoint)
+    if view is not None and hasattr(view, 'admission'):
+        return view.admission
+    return 'write' if request.method in WRITE_METHODS else None
+
+
+def _admit():
+    app = current_app
+    gate = app.extensions.get('admission')
+    name = _class_for_request(app)
+    if gate is None or name is None:
+        return None
+    reason = gate.acquire(name)
+    if reason is None:
+        g.admission = name
+        return None
+    retry_after = int(app.config.get('ADMISSION_RETRY_AFTER_SECONDS', 2))
+    response, status = Response.error(503, 'Server busy, please retry later', {'class': name, 'reason': reason})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status
+
+
+def _release(_exc=None):
+    name = g.pop('admission', None)
+    if name is not None:
+        current_app.extensions['admission'].release(name)
+
+
+def init_app(app: Flask) -> None:
+    if not app.config.get('ADMISSION_ENABLED', True):
+        return
+    config = app.config
+    gate = Gate(int(config.get('ADMISSION_MAX_ACTIVE', 8)), [
+        _Class('write', None, int(config.get('ADMISSION_WRITE_QUEUE', 32)),
+               float(config.get('ADMISSION_WRITE_WAIT_SECONDS', 5)), priority=0),
+        _Class('report', int(config.get('ADMISSION_REPORT_CONCURRENCY', 2)), int(config.get('ADMISSION_REPORT_QUEUE', 4)),
+               float(config.get('ADMISSION_REPORT_WAIT_SECONDS', 2)), priority=1),
+    ])
+    app.extensions['admission'] = gate
+    metrics.register_gauge('admission', gate.snapshot)
+    app.before_request(_admit)
+    # teardown 在流式响应生成完之后才跑，名额一直占到导出结束
+    app.teardown_request(_release)
@@ -0,0 +1,186 @@
+"""库存流水冷热分离：超过保留期的流水按月搬到 stock_operations_archive，留下月度汇总。
+
+每月 1 日的任务先给所有商品落一次截止日前一天的估值检查点，再按 op_id 分批
+（复制到归档表 → 累加月度汇总 → 从热表删除，每批一个事务）搬走截止日之前的流水。
+截止日在搬之前记进 stock_operation_archive_runs，估值据此判断检查点之后的流水还在不在热表。
+读接口用 source(since, until) 取流水来源：查询区间碰不到归档范围时就是 StockOperation 本身，
+碰到了才换成热表和归档表 UNION ALL 的别名实体，日期条件下推到两边。
+"""
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm import aliased
+
+from . import db, metrics
+from .models import StockOperation, StockOperationArchive, StockOperationArchiveRun, StockOperationMonthly
+from .transactions import transactional
+
+MIN_RETENTION_MONTHS = 3
+
+# 归档任务只在跑定时任务的进程里执行，进程内的缓存版本通知不到其他 worker；
+# 边界和截止日每次都查库（两个都有索引，取 max 只碰一个索引页），不缓存
+
+
+def boundary():
+    """归档表里最晚一条流水的时间；没有归档时返回 None。"""
+    return db.session.execute(select(func.max(StockOperationArchive.created_at))).scalar()
+
+
+def cutoff():
+    """最近一次归档的截止日，早于它的流水可能已经不在热表；从没归档过时返回 None。"""
+    return db.session.execute(select(func.max(StockOperationArchiveRun.cutoff))).scalar()
+
+
+def reaches_archive(since=None) -> bool:
+    edge = boundary()
+    return edge is not None and (since is None or since <= edge)
+
+
+def source(since=None, until=None):
+    """返回查 [since, until] 区间流水要用的实体：StockOperation 或热表 + 归档表的 UNION ALL 别名。
+
+    返回的别名和 StockOperation 有同样的属性（含 product 关联），调用方照常加条件；
+    since/until 只用来判断要不要带上归档表，并下推到两边的子查询里。
+    """
+    if not reaches_archive(since):
+        return StockOperation
+    hot = StockOperation.__table__
+    cold = StockOperationArchive.__table__
+    branches = []
+    for table in (hot, cold):
+        stmt = select(*(table.c[c.name] for c in hot.columns))
+        if since is not None:
+            stmt = stmt.where(table.c.created_at >= since)
+        if until is not None:
+            stmt = stmt.where(table.c.created_at <= until)
+        branches.append(stmt)
+    metrics.inc('archive.union_reads')
+    return aliased(StockOperation, union_all(*branches).subquery('stock_operations_all'))
+
+
+def source_after(op_id: int):
+    """按 op_id 水位增量读流水时用的实体：水位还没越过归档表里最大的 op_id 时要连归档表一起读。"""
+    if boundary() is None:
+        return StockOperation
+    archived = db.session.execute(select(func.max(StockOperationArchive.op_id))).scalar()
+    return source() if archived and op_id < archived else StockOperation
+
+
+def get_operation(op_id: int):
+    """按 ID 取一条流水，热表没有再查归档表。"""
+    op = StockOperation.query.get(op_id)
+    if op is None and boundary() is not None:
+        Ops = source()
+        op = db.session.query(Ops).filter(Ops.op_id == op_id).first()
+    return op
+
+
+def has_operations(product_id: int) -> bool:
+    """商品有没有流水（热表或归档表）；删除商品靠它把关，归档表直接查，不经过边界判断。"""
+    if StockOperation.query.filter_by(product_id=product_id).first():
+        return True
+    return db.session.query(
+        select(StockOperationArchive.op_id).where(StockOperationArchive.product_id == product_id).exists()
+    ).scalar()
+
+
+def cutoff_for(today: date, retention_months: int) -> date:
+    """保留最近 retention_months 个整月加上当月，返回第一个要保留的月份的 1 日。"""
+    months = max(int(retention_months), MIN_RETENTION_MONTHS)
+    index = today.year * 12 + today.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def run(retention_months: int = 12, batch_size: int = 5000, today: date = None) -> dict:
+    from . import valuation
+
+    started = time.perf_counter()
+    cutoff = cutoff_for(today or date.today(), retention_months)
+    cutoff_dt = datetime.combine(cutoff, datetime.min.time())
+
+    # 先落检查点：之后截止日及以后的估值从检查点往后重放，用不到归档的流水
+    valuation.compute(cutoff - timedelta(days=1), persist=True)
+    run_id = _start_run(cutoff)
+
+    moved = batches = 0
+    while True:
+        count = _archive_batch(cutoff_dt, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+    _finish_run(run_id, moved)
+
+    metrics.inc('archive.moved_ops', moved)
+    metrics.observe('archive.seconds', time.perf_counter() - started)
+    return {'cutoff': cutoff.isoformat(), 'moved': moved, 'batches': batches}
+
+
+@transactional
+def _start_run(cutoff: date) -> int:
+    run = StockOperationArchiveRun(cutoff=cutoff, moved_ops=0)
+    db.session.add(run)
+    db.session.flush()
+    return run.run_id
+
+
+@transactional
+def _finish_run(run_id: int, moved: int) -> None:
+    run = StockOperationArchiveRun.query.get(run_id)
+    run.moved_ops = moved
+    run.finished_at = datetime.utcnow()
+
+
+@transactional
+def _archive_batch(cutoff: datetime, batch_size: int) -> int:
+    hot = StockOperation.__table__
+    cold = StockOperationArchive.__table__
+    rows = db.session.execute(
+        select(hot.c.operation_id, hot.c.product_id, hot.c.type, hot.c.quantity, hot.c.total_price, hot.c.created_at)
+        .where(hot.c.created_at < cutoff)
+        .order_by(hot.c.operation_id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+    ids = [r.operation_id for r in rows]
+
+    columns = [c.name for c in hot.columns]
+    db.session.execute(
+        insert(cold).from_select(columns, select(*(hot.c[name] for name in columns)).where(hot.c.operation_id.in_(ids)))
+    )
+    _add_to_rollups(rows)
+    db.session.execute(delete(hot).where(hot.c.operation_id.in_(ids)))
+    return len(ids)
+
+
+def _add_to_rollups(rows) -> None:
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for r in rows:
+        key = (r.product_id, r.created_at.date().replace(day=1), r.type)
+        total = totals[key]
+        total[0] += 1
+        total[1] += r.quantity
+        total[2] += abs(r.quantity)
+        total[3] += r.total_price or 0
+
+    existing = {
+        (m.product_id, m.month, m.op_type): m
+        for m in StockOperationMonthly.query.filter(
+            StockOperationMonthly.product_id.in_({k[0] for k in totals}),
+            StockOperationMonthly.month.in_({k[1] for k in totals}),
+        )
+    }
+    for key, (count, quantity, abs_quantity, amount) in totals.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = StockOperationMonthly(product_id=key[0], month=key[1], op_type=key[2],
+                                           op_count=0, quantity=0, abs_quantity=0, total_price=0)
+            db.session.add(rollup)
+        rollup.op_count += count
+        rollup.quantity += quantity
+        rollup.abs_quantity += abs_quantity
+        rollup.total_price += amount
+    db.session.flush()
@@ -0,0 +1,72 @@
+"""进程内缓存与数据版本号。
+
+写路径在提交后调用 bump(namespace) 让该命名空间的版本号 +1；缓存项记下写入时的
+版本号，读取时版本变了就当作未命中。版本号只在本进程内有效，多 worker 之间靠
+TTL 兜底，所以 TTL 要按能容忍的陈旧时间来设。
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from . import metrics
+
+_versions = defaultdict(int)
+_versions_lock = threading.Lock()
+
+
+def bump(*namespaces: str) -> None:
+    with _versions_lock:
+        for ns in namespaces:
+            _versions[ns] += 1
+
+
+def version(*namespaces: str) -> tuple:
+    return tuple(_versions[ns] for ns in namespaces)
+
+
+class TTLCache:
+    """带 TTL 和版本校验的 LRU 缓存。"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256, depends_on=()):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.depends_on = tuple(depends_on)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, ver = entry
+                if expires_at > now and ver == version(*self.depends_on):
+                    self._data.move_to_end(key)
+                    metrics.inc(f'cache.{self.name}.hit')
+                    return value
+                del self._data[key]
+        metrics.inc(f'cache.{self.name}.miss')
+        return None
+
+    def set(self, key, value, ver=None) -> None:
+        if ver is None:
+            ver = version(*self.depends_on)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl, ver)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            # 版本号在计算前取，算的过程中有写入的话这份结果下次读就会作废
+            ver = version(*self.depends_on)
+            value = compute()
+            self.set(key, value, ver)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
@@ -1,9 +1,7 @@
 from flask import Blueprint, request
-from sqlalchemy import func
-
-from . import db
+from . import counters, db
 from .models import Category, Product
-from .schemas import category_to_dict
+from .schemas import CATEGORY_FIELDS, category_to_dict, load_options, parse_fields
 from .utils import Response, ValidationError, NotFoundError, role_required
 
 bp = Blueprint('categories_bp', __name__)
@@ -14,33 +12,19 @@ def list_categories():
     page = int(request.args.get('page', 1))
     size = int(request.args.get('size', 20))
     keyword = (request.args.get('keyword') or '').strip()
+    fields = parse_fields(request.args.get('fields'), CATEGORY_FIELDS)
 
-    q = db.session.query(Category)
+    q = db.session.query(Category).options(*load_options(Category, CATEGORY_FIELDS, fields))
     if keyword:
         q = q.filter(Category.category_name.ilike(f'%{keyword}%'))
 
     total = q.count()
     rows = q.order_by(Category.category_id.desc()).offset((page - 1) * size).limit(size).all()
 
-    category_ids = [x.category_id for x in rows]
-    stats_map = {}
-    if category_ids:
-        stats_rows = (
-            db.session.query(
-                Product.category_id.label('category_id'),
-                func.count(Product.product_id).label('product_count'),
-                func.coalesce(func.sum(Product.stock), 0).label('total_stock'),
-            )
-            .filter(Product.category_id.in_(category_ids))
-            .group_by(Product.category_id)
-            .all()
-        )
-        stats_map = {
-            r.category_id: {'product_count': int(r.product_count), 'total_stock': int(r.total_stock)}
-            for r in stats_rows
-        }
-
-    payload = [category_to_dict(item, stats_map.get(item.category_id, {'product_count': 0, 'total_stock': 0})) for item in rows]
+    if fields:
+        payload = [category_to_dict(item, fields=fields) for item in rows]
+    else:
+        payload = [category_to_dict(item, counters.stats(item)) for item in rows]
     return Response.pagination(payload, total, page, size)
 
 
@@ -69,7 +53,7 @@ def get_category(category_id: int):
     category = Category.query.get(category_id)
     if not category:
         raise NotFoundError('Category not found')
-    return Response.success(category_to_dict(category))
+    return Response.success(category_to_dict(category, counters.stats(category)))
 
 
 @bp.route('/<int:category_id>', methods=['PUT'])
@@ -95,7 +79,7 @@ def update_category(category_id: int):
         category.description = description or None
 
     db.session.commit()
-    return Response.success(category_to_dict(category))
+    return Response.success(category_to_dict(category, counters.stats(category)))
 
 
 @bp.route('/<int:category_id>', methods=['DELETE'])
@@ -0,0 +1,88 @@
+"""组提交：同一个 key 上短时间内并发到达的请求合并成一批执行。
+
+第一个到达的请求当 leader，等一个很短的窗口收集同 key 的后来者（follower），
+然后用一个事务处理整批，再把各自的结果分发回去。只在同一进程内合并，
+gunicorn 需要用 gthread worker（--threads > 1）才会有并发可合。
+"""
+import copy
+import threading
+
+from . import metrics
+
+
+class _Batch:
+    __slots__ = ('payloads', 'results', 'error', 'full', 'done')
+
+    def __init__(self):
+        self.payloads = []
+        self.results = None
+        self.error = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class Coalescer:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def submit(self, key, payload, execute, window: float, max_batch: int, timeout: float = 60):
+        """提交一个请求，返回它自己的结果；结果是异常实例时直接抛出。
+
+        execute(key, payloads) 负责整批执行，按顺序返回与 payloads 等长的结果列表，
+        单个请求的业务错误以异常实例放在对应位置，整批失败则直接抛异常。
+        follower 最多等 window + timeout 秒，等不到抛 TimeoutError（这时那一批可能还会提交）。
+        """
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.payloads)
+            batch.payloads.append(payload)
+            if len(batch.payloads) >= max_batch:
+                # 批次满了，不再接人，叫醒 leader 提前执行
+                del self._open[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            try:
+                batch.results = execute(key, batch.payloads)
+            except Exception as e:
+                batch.error = e
+            except BaseException as e:
+                # leader 被 SystemExit 之类打断：follower 照样要拿到失败，不能读到空的 results
+                batch.error = e
+                raise
+            finally:
+                batch.done.set()
+            metrics.inc(f'{self.name}.batches')
+            metrics.observe(f'{self.name}.batch_size', len(batch.payloads))
+        elif not batch.done.wait(window + timeout):
+            metrics.inc(f'{self.name}.wait_timeouts')
+            raise TimeoutError(f'{self.name}: batch did not finish within {window + timeout:.1f}s')
+
+        if batch.error is not None:
+            if leader:
+                raise batch.error
+            # 整批失败：每个 follower 抛自己的一份（类型不变），traceback 不会在线程之间串
+            raise _copy_error(batch.error) from batch.error
+        result = batch.results[index]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def _copy_error(error: BaseException) -> Exception:
+    if not isinstance(error, Exception):
+        return RuntimeError(f'Coalesced batch aborted: {error!r}')
+    try:
+        return copy.copy(error)
+    except Exception:
+        # 构造参数还原不出来的异常类型，退回包一层
+        return RuntimeError(f'Coalesced batch failed: {error!r}')
@@ -0,0 +1,101 @@
+"""商品编码 → 精简商品记录的进程内索引，给扫码枪按编码查商品用。
+
+只放商品目录字段（名称、售价、分类、状态等），库存每次出入库都会变，不放进来。
+单个商品的增删改在提交后 discard 对应编码，批量修改和导入直接 clear；
+未命中时一条 IN 查询回库补齐。别的 worker 改了商品这里收不到通知：每次查之前先取一次
+max(products.updated_at)（有索引），变了就整体清空；物理删除不会改它，靠 CODE_INDEX_TTL_SECONDS 兜底。
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from . import db, metrics
+from .models import Product
+
+_COLUMNS = (
+    Product.product_id, Product.product_code, Product.product_name, Product.category_id,
+    Product.supplier_id, Product.sale_price, Product.storage_location, Product.status,
+)
+
+
+def _record(row) -> dict:
+    return {
+        'product_id': row.product_id,
+        'product_code': row.product_code,
+        'product_name': row.product_name,
+        'category_id': row.category_id,
+        'supplier_id': row.supplier_id,
+        'sale_price': float(row.sale_price),
+        'storage_location': row.storage_location,
+        'status': row.status,
+    }
+
+
+class CodeIndex:
+    def __init__(self, ttl: float = None, maxsize: int = 200000):
+        # ttl 为 None 时取 CODE_INDEX_TTL_SECONDS
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+        # 每次失效 +1；回库期间有失效的话这次查到的行不回填，免得把旧数据写回去
+        self._generation = 0
+        self._version = None
+
+    def resolve(self, codes) -> dict:
+        """返回 {编码: 记录}，不存在的编码不在结果里。"""
+        self._check_version()
+        now = time.monotonic()
+        found, missing = {}, []
+        data = self._data
+        for code in codes:
+            entry = data.get(code)
+            if entry is not None and entry[1] > now:
+                found[code] = entry[0]
+            else:
+                missing.append(code)
+        metrics.inc('code_index.hit', len(found))
+        if missing:
+            metrics.inc('code_index.miss', len(missing))
+            found.update(self._load(missing))
+        return found
+
+    def _check_version(self) -> None:
+        version = db.session.connection().execute(select(func.max(Product.updated_at))).scalar()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._generation += 1
+                    self._data.clear()
+                    self._version = version
+                    metrics.inc('code_index.invalidated')
+
+    def _load(self, codes) -> dict:
+        generation = self._generation
+        rows = db.session.connection().execute(select(*_COLUMNS).where(Product.product_code.in_(codes))).all()
+        loaded = {row.product_code: _record(row) for row in rows}
+        ttl = self.ttl if self.ttl is not None else current_app.config.get('CODE_INDEX_TTL_SECONDS', 10)
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            if generation == self._generation:
+                for code, record in loaded.items():
+                    self._data[code] = (record, expires_at)
+                while len(self._data) > self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+        return loaded
+
+    def discard(self, *codes) -> None:
+        with self._lock:
+            self._generation += 1
+            for code in codes:
+                self._data.pop(code, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+
+index = CodeIndex()
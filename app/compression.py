@@ -0,0 +1,176 @@
+"""响应压缩：按 Accept-Encoding 协商 zstd / br / gzip。
+
+gzip 用标准库；brotli、zstandard 两个包装了才会参与协商，没装就只用 gzip。
+普通响应低于阈值不压；流式响应（stream_with_context 的报表导出）边生成边压，不攒整包。
+各接口的压缩级别用 @compress(...) 单独指定，没指定的用配置里的默认级别。
+指标：compression.<编码>.responses、compression.bytes_in/bytes_out/bytes_saved，
+compression.cpu_seconds 记每个响应压缩花的 CPU 时间（线程 CPU 时间）。
+"""
+import time
+import zlib
+
+from flask import Flask, current_app, request
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html')
+DEFAULT_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+_LEVEL_KEYS = {'gzip': 'COMPRESSION_GZIP_LEVEL', 'br': 'COMPRESSION_BROTLI_LEVEL', 'zstd': 'COMPRESSION_ZSTD_LEVEL'}
+
+
+def available_encodings() -> tuple:
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return tuple(encodings)
+
+
+def compress(enabled: bool = True, min_size: int = None, **levels):
+    """给单个接口指定压缩参数，如 @compress(gzip=9, br=7, zstd=10) 或 @compress(False)。"""
+    unknown = set(levels) - set(DEFAULT_LEVELS)
+    if unknown:
+        raise TypeError(f'Unknown encodings: {", ".join(sorted(unknown))}')
+
+    def decorator(fn):
+        fn.compression = {'enabled': enabled, 'min_size': min_size, 'levels': levels}
+        return fn
+    return decorator
+
+
+def negotiate(accept_encoding: str, preferred) -> str:
+    """按服务端偏好顺序，挑客户端可接受（q > 0）的第一个编码；都不行返回 None。"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    for encoding in preferred:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def _compressor(encoding: str, level: int):
+    """返回 (compress(chunk), flush()) 一对函数。"""
+    if encoding == 'gzip':
+        obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return obj.compress, obj.flush
+    if encoding == 'br':
+        obj = brotli.Compressor(quality=level)
+        return obj.process, obj.finish
+    obj = zstandard.ZstdCompressor(level=level).compressobj()
+    return obj.compress, obj.flush
+
+
+def _record(encoding: str, size_in: int, size_out: int, cpu: float) -> None:
+    metrics.inc(f'compression.{encoding}.responses')
+    metrics.inc('compression.bytes_in', size_in)
+    metrics.inc('compression.bytes_out', size_out)
+    metrics.inc('compression.bytes_saved', size_in - size_out)
+    metrics.observe('compression.cpu_seconds', cpu)
+
+
+def _stream(chunks, encoding: str, level: int):
+    compress_chunk, flush = _compressor(encoding, level)
+    size_in = size_out = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            started = time.thread_time()
+            out = compress_chunk(chunk)
+            cpu += time.thread_time() - started
+            size_in += len(chunk)
+            if out:
+                size_out += len(out)
+                yield out
+        started = time.thread_time()
+        out = flush()
+        cpu += time.thread_time() - started
+        size_out += len(out)
+        yield out
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+    _record(encoding, size_in, size_out, cpu)
+
+
+def _settings(app: Flask) -> dict:
+    view = app.view_functions.get(request.endpoint) if request.endpoint else None
+    return getattr(view, 'compression', None) or {}
+
+
+def _compress_response(response):
+    app = current_app
+    if not app.config.get('COMPRESSION_ENABLED', True) or request.method == 'HEAD':
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304) or response.direct_passthrough:
+        return response
+    if 'Content-Encoding' in response.headers or 'no-transform' in response.headers.get('Cache-Control', ''):
+        return response
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    settings = _settings(app)
+    if not settings.get('enabled', True):
+        return response
+    response.vary.add('Accept-Encoding')
+    preferred = [e for e in (app.config.get('COMPRESSION_ENCODINGS') or available_encodings())
+                 if e in available_encodings()]
+    encoding = negotiate(request.headers.get('Accept-Encoding'), preferred)
+    if encoding is None:
+        return response
+    level = settings.get('levels', {}).get(encoding)
+    if level is None:
+        level = app.config.get(_LEVEL_KEYS[encoding], DEFAULT_LEVELS[encoding])
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        min_size = settings.get('min_size')
+        if min_size is None:
+            min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        if len(body) < min_size:
+            return response
+        started = time.thread_time()
+        compress_chunk, flush = _compressor(encoding, level)
+        compressed = compress_chunk(body) + flush()
+        cpu = time.thread_time() - started
+        if len(compressed) >= len(body):
+            return response
+        response.set_data(compressed)
+        _record(encoding, len(body), len(compressed), cpu)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app: Flask) -> None:
+    app.after_request(_compress_response)
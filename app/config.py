@@ -11,15 +11,86 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-me')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=int(os.getenv('JWT_EXPIRE_HOURS', '8')))
 
-    # 数据库连接健壮性：断线重连、心跳
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True,
-        "pool_recycle": 280,
-        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
-        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
-        "pool_timeout": 30,
-    }
+    # 引擎调优档位（sqlite-edge / mysql-prod / default），不填按 DATABASE_URL 推断，见 app/engine.py。
+    # 连接池大小用 DB_POOL_SIZE / DB_MAX_OVERFLOW 调；这里写的键会覆盖档位默认值。
+    DB_ENGINE_PROFILE = os.getenv('DB_ENGINE_PROFILE')
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     
     # 应用配置
     APP_ENV = os.getenv('APP_ENV', 'development')
     DEBUG = os.getenv('DEBUG', 'True').lower() in ('true', '1', 't')
+
+    # 定时任务开关：多机部署时只留一台开着
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True').lower() in ('true', '1', 't')
+    SCHEDULER_START_DELAY = float(os.getenv('SCHEDULER_START_DELAY', '5'))
+
+    # 冷启动：迁移命令以外不加载 Flask-Migrate；开启预热则在接流量前建好连接池
+    MIGRATIONS_ENABLED = os.getenv('MIGRATIONS_ENABLED', 'False').lower() in ('true', '1', 't')
+    APP_PREWARM = os.getenv('APP_PREWARM', 'False').lower() in ('true', '1', 't')
+    PREWARM_CONNECTIONS = int(os.getenv('PREWARM_CONNECTIONS', '0')) or None
+
+    # 死锁/锁等待超时时事务整段重放的次数和退避基数（秒）
+    DB_TX_RETRIES = int(os.getenv('DB_TX_RETRIES', '3'))
+    DB_TX_RETRY_BASE_DELAY = float(os.getenv('DB_TX_RETRY_BASE_DELAY', '0.02'))
+
+    # 热点商品出库合并：窗口内同一商品的并发出库合成一个事务（0 表示关闭）；
+    # 跟车的请求最多再等几秒（要长过锁等待超时加重试）
+    STOCK_OUT_COALESCE_WINDOW_MS = float(os.getenv('STOCK_OUT_COALESCE_WINDOW_MS', '0'))
+    STOCK_OUT_COALESCE_MAX_BATCH = int(os.getenv('STOCK_OUT_COALESCE_MAX_BATCH', '64'))
+    STOCK_OUT_COALESCE_WAIT_SECONDS = float(os.getenv('STOCK_OUT_COALESCE_WAIT_SECONDS', '120'))
+
+    # 商品批量导入：每批行数、最多返回的行级错误数；后台任务状态目录（默认 instance/jobs）
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+    PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv('PRODUCT_IMPORT_MAX_ERRORS', '1000'))
+    JOBS_DIR = os.getenv('JOBS_DIR')
+
+    # 扫码查商品的编码索引：条目最多缓存几秒（商品改动会按 max(updated_at) 提前失效）
+    CODE_INDEX_TTL_SECONDS = float(os.getenv('CODE_INDEX_TTL_SECONDS', '10'))
+
+    # 补货建议：回看天数、供应商提前期、盘点周期（天）、服务水平；夜间结果存放目录（默认 instance/reports）
+    REORDER_LOOKBACK_DAYS = int(os.getenv('REORDER_LOOKBACK_DAYS', '56'))
+    REORDER_LEAD_TIME_DAYS = int(os.getenv('REORDER_LEAD_TIME_DAYS', '7'))
+    REORDER_REVIEW_DAYS = int(os.getenv('REORDER_REVIEW_DAYS', '7'))
+    REORDER_SERVICE_LEVEL = float(os.getenv('REORDER_SERVICE_LEVEL', '0.95'))
+    REPORTS_DIR = os.getenv('REPORTS_DIR')
+
+    # 响应压缩：按偏好顺序协商（zstd、br 需要装 zstandard / brotli），小于阈值（字节）的响应不压
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() in ('true', '1', 't')
+    COMPRESSION_ENCODINGS = tuple(e.strip() for e in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if e.strip())
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_LEVEL = int(os.getenv('COMPRESSION_BROTLI_LEVEL', '5'))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', '3'))
+
+    # 库存流水归档：保留最近几个整月（至少 3 个月）在热表，每月 1 日把更早的搬到归档表，每批行数
+    STOCK_OPS_RETENTION_MONTHS = int(os.getenv('STOCK_OPS_RETENTION_MONTHS', '12'))
+    STOCK_OPS_ARCHIVE_BATCH = int(os.getenv('STOCK_OPS_ARCHIVE_BATCH', '5000'))
+
+    # 库存流水列式缓存（NumPy memmap，默认目录 instance/ledger）：开启后定时按 op_id 水位追加，趋势报表直接读它；
+    # 只追加多少秒之前的流水：created_at 在 flush 时赋值，要比最长的事务 / 锁等待（InnoDB 默认 50s，
+    # SQLite busy_timeout 30s）再宽裕一些，否则晚提交的小 op_id 会落在水位之下被永久跳过
+    LEDGER_CACHE_ENABLED = os.getenv('LEDGER_CACHE_ENABLED', 'False').lower() in ('true', '1', 't')
+    LEDGER_CACHE_DIR = os.getenv('LEDGER_CACHE_DIR')
+    LEDGER_CACHE_SYNC_SECONDS = int(os.getenv('LEDGER_CACHE_SYNC_SECONDS', '60'))
+    LEDGER_CACHE_LAG_SECONDS = int(os.getenv('LEDGER_CACHE_LAG_SECONDS', '300'))
+
+    # 库存流水小时汇总：趋势、日报从汇总表读；同步间隔、只汇总多少秒之前的流水（同 LEDGER_CACHE_LAG_SECONDS，
+    # 要长过最长的事务和锁等待）、每批条数
+    STOCK_ROLLUP_ENABLED = os.getenv('STOCK_ROLLUP_ENABLED', 'True').lower() in ('true', '1', 't')
+    STOCK_ROLLUP_SYNC_SECONDS = int(os.getenv('STOCK_ROLLUP_SYNC_SECONDS', '60'))
+    STOCK_ROLLUP_LAG_SECONDS = int(os.getenv('STOCK_ROLLUP_LAG_SECONDS', '300'))
+    STOCK_ROLLUP_BATCH = int(os.getenv('STOCK_ROLLUP_BATCH', '5000'))
+
+    # 库存报表 start_date~end_date 最多跨多少天
+    INVENTORY_REPORT_MAX_DAYS = int(os.getenv('INVENTORY_REPORT_MAX_DAYS', '366'))
+
+    # 准入控制（每进程）：受控请求总名额（建议等于 worker 线程数）；重报表同时几个、排队几个、最多等几秒；
+    # 写请求排队上限和等待秒数；排不上时 Retry-After 给几秒
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() in ('true', '1', 't')
+    ADMISSION_MAX_ACTIVE = int(os.getenv('ADMISSION_MAX_ACTIVE', '8'))
+    ADMISSION_REPORT_CONCURRENCY = int(os.getenv('ADMISSION_REPORT_CONCURRENCY', '2'))
+    ADMISSION_REPORT_QUEUE = int(os.getenv('ADMISSION_REPORT_QUEUE', '4'))
+    ADMISSION_REPORT_WAIT_SECONDS = float(os.getenv('ADMISSION_REPORT_WAIT_SECONDS', '2'))
+    ADMISSION_WRITE_QUEUE = int(os.getenv('ADMISSION_WRITE_QUEUE', '32'))
+    ADMISSION_WRITE_WAIT_SECONDS = float(os.getenv('ADMISSION_WRITE_WAIT_SECONDS', '5'))
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', '2'))
@@ -0,0 +1,78 @@
+"""分类 / 供应商的商品数和库存合计：写路径在同一事务里增量维护，读时直接取列。
+
+增量用 `col = col + :delta` 的原子 UPDATE，不读后写；同一事务里的多次变化先在内存合并，
+提交前按表、按 id 排序一次性写出，加锁顺序固定，避免互相等待。
+计数不算对分类 / 供应商的编辑，UPDATE 时 updated_at 保持原值，不触发 onupdate。
+repair() 按 products 表重算，用来修正历史数据或意外漂移。
+"""
+from collections import defaultdict
+
+from sqlalchemy import func, or_, select, update
+
+from . import db, metrics
+from .models import Category, Product, Supplier
+
+_TARGETS = (
+    (Category, Category.category_id, Product.category_id),
+    (Supplier, Supplier.supplier_id, Product.supplier_id),
+)
+
+
+class Deltas:
+    """一个事务内累计的计数变化。"""
+
+    def __init__(self):
+        self._changes = {Category: defaultdict(lambda: [0, 0]), Supplier: defaultdict(lambda: [0, 0])}
+
+    def add(self, category_id, supplier_id, products: int = 0, stock: int = 0):
+        for model, key in ((Category, category_id), (Supplier, supplier_id)):
+            if key is not None and (products or stock):
+                change = self._changes[model][key]
+                change[0] += products
+                change[1] += stock
+        return self
+
+    def move(self, old, new, stock: int):
+        """商品换了分类/供应商：old、new 都是 (category_id, supplier_id)。"""
+        if old[0] != new[0]:
+            self.add(old[0], None, -1, -stock).add(new[0], None, 1, stock)
+        if old[1] != new[1]:
+            self.add(None, old[1], -1, -stock).add(None, new[1], 1, stock)
+        return self
+
+    def apply(self) -> None:
+        for model, pk, _ in _TARGETS:
+            for key in sorted(self._changes[model]):
+                products, stock = self._changes[model][key]
+                if not products and not stock:
+                    continue
+                db.session.execute(
+                    update(model)
+                    .where(pk == key)
+                    .values(product_count=model.product_count + products, total_stock=model.total_stock + stock,
+                            updated_at=model.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+            self._changes[model].clear()
+
+
+def stats(row) -> dict:
+    return {'product_count': row.product_count or 0, 'total_stock': row.total_stock or 0}
+
+
+def repair() -> int:
+    """按 products 表重算两张表的计数，只改有偏差的行，返回修正的行数。"""
+    fixed = 0
+    for model, pk, fk in _TARGETS:
+        count = select(func.count(Product.product_id)).where(fk == pk).scalar_subquery()
+        stock = select(func.coalesce(func.sum(Product.stock), 0)).where(fk == pk).scalar_subquery()
+        result = db.session.execute(
+            update(model)
+            .where(or_(model.product_count != count, model.total_stock != stock))
+            .values(product_count=count, total_stock=stock, updated_at=model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        fixed += result.rowcount
+    db.session.commit()
+    metrics.inc('counters.repaired', fixed)
+    return fixed
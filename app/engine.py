@@ -0,0 +1,148 @@
+"""数据库引擎调优档位。
+
+DB_ENGINE_PROFILE 选档位，不填则按 DATABASE_URL 推断：
+
+- ``sqlite-edge``：门店边缘机上的单文件库。WAL 让读和写互不阻塞，
+  synchronous=NORMAL 在 WAL 下只在 checkpoint 时 fsync，busy_timeout 让写锁
+  排队等待而不是立刻报 "database is locked"，mmap 省掉读路径上的系统调用。
+- ``mysql-prod``：中心 MySQL，调大连接池并用 LIFO 复用热连接。PyMySQL 不支持
+  服务端预编译语句，改为调大 SQLAlchemy 的 compiled cache，语句只编译一次。
+- ``default``：不做任何调整，等同 SQLAlchemy 默认值。
+
+档位默认值 < DB_POOL_SIZE / DB_MAX_OVERFLOW 环境变量 < SQLALCHEMY_ENGINE_OPTIONS。
+"""
+import os
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine import default as engine_default
+from sqlalchemy.pool import QueuePool
+
+from . import metrics
+
+ENGINE_PROFILES = {
+    'sqlite-edge': {
+        'engine_options': {
+            'poolclass': QueuePool,
+            'pool_size': 5,
+            'max_overflow': 5,
+            'pool_timeout': 30,
+            'connect_args': {'check_same_thread': False},
+        },
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 30000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+    'mysql-prod': {
+        'engine_options': {
+            'pool_pre_ping': True,
+            'pool_recycle': 280,
+            'pool_size': 20,
+            'max_overflow': 20,
+            'pool_timeout': 10,
+            'pool_use_lifo': True,
+            'query_cache_size': 2000,
+            'connect_args': {'connect_timeout': 5},
+        },
+        'pragmas': {},
+    },
+    'default': {
+        'engine_options': {},
+        'pragmas': {},
+    },
+}
+
+_CACHE_RESULTS = {
+    engine_default.CACHE_HIT: 'hit',
+    engine_default.CACHE_MISS: 'miss',
+    engine_default.CACHING_DISABLED: 'disabled',
+    engine_default.NO_CACHE_KEY: 'no_key',
+}
+
+_POOL_KEYS = ('poolclass', 'pool_size', 'max_overflow', 'pool_timeout', 'pool_use_lifo')
+
+
+def resolve_profile(app: Flask) -> str:
+    name = app.config.get('DB_ENGINE_PROFILE')
+    if name:
+        if name not in ENGINE_PROFILES:
+            raise ValueError(f'Unknown DB_ENGINE_PROFILE {name!r}, expected one of {sorted(ENGINE_PROFILES)}')
+        return name
+    backend = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    if backend == 'sqlite':
+        return 'sqlite-edge'
+    if backend in ('mysql', 'mariadb'):
+        return 'mysql-prod'
+    return 'default'
+
+
+def configure_engine_options(app: Flask) -> str:
+    """在 db.init_app 之前把档位合并进 SQLALCHEMY_ENGINE_OPTIONS，返回档位名。"""
+    name = resolve_profile(app)
+    options = dict(ENGINE_PROFILES[name]['engine_options'])
+    options['connect_args'] = dict(options.get('connect_args', {}))
+
+    if name != 'default':
+        if os.getenv('DB_POOL_SIZE'):
+            options['pool_size'] = int(os.getenv('DB_POOL_SIZE'))
+        if os.getenv('DB_MAX_OVERFLOW'):
+            options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW'))
+
+    overrides = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options['connect_args'].update(overrides.pop('connect_args', {}))
+    options.update(overrides)
+    if not options['connect_args']:
+        del options['connect_args']
+
+    # 内存库由 Flask-SQLAlchemy 固定用 StaticPool，连接池参数给了反而报错
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        for key in _POOL_KEYS:
+            options.pop(key, None)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config['DB_ENGINE_PROFILE'] = name
+    return name
+
+
+def _count_compiled_cache(_conn, _cursor, _statement, _parameters, context, _executemany):
+    # cache_hit 是 SQLAlchemy 给每次执行打的标记：命中 / 未命中 / 不可缓存
+    if context is not None:
+        metrics.inc(f'sql.compiled_cache.{_CACHE_RESULTS.get(context.cache_hit, "other")}')
+
+
+def _compiled_cache_stats(engines):
+    def stats():
+        counters = metrics.snapshot_counters('sql.compiled_cache.')
+        hits = counters.get('sql.compiled_cache.hit', 0)
+        return {
+            'hit_rate': metrics.ratio(hits, hits + counters.get('sql.compiled_cache.miss', 0)),
+            'entries': sum(len(e._compiled_cache) for e in engines if e._compiled_cache is not None),
+        }
+    return stats
+
+
+def install_engine_hooks(app: Flask, db) -> None:
+    """db.init_app 之后给引擎挂事件：档位里的 PRAGMA、compiled cache 命中统计。"""
+    pragmas = ENGINE_PROFILES[app.config['DB_ENGINE_PROFILE']]['pragmas']
+
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f'PRAGMA {key}={value}')
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if pragmas and engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _set_pragmas)
+        event.listen(engine, 'after_cursor_execute', _count_compiled_cache)
+    metrics.register_gauge('sql.compiled_cache', _compiled_cache_stats(engines))
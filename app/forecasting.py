@@ -0,0 +1,186 @@
+"""需求预测与补货建议：商品 × 天的出库矩阵上整体向量化计算，不逐个商品循环。
+
+日需求 = 近 7 天均值与整个窗口均值各占一半；安全库存 = z × 日需求标准差 × √提前期；
+再订货点 = 日需求 × 提前期 + 安全库存；补到 日需求 × (提前期 + 盘点周期) + 安全库存。
+NumPy 只在报表模块里用，路由里按需导入，不影响冷启动。
+"""
+import json
+import os
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import Integer, func, literal, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from . import archive, db, metrics
+from .models import Product, Supplier
+
+SHORT_WINDOW = 7
+
+
+class PeriodsBefore(ColumnElement):
+    """created_at 所在日期距 end 往前第几个周期（每 width 天一个，end 当天所在周期为 0）。
+
+    在 SQL 里直接算成整数再 GROUP BY，按周/月汇总时结果行数成倍减少，也省掉逐行解析日期。
+    """
+    inherit_cache = True
+    type = Integer()
+    _traverse_internals = [
+        ('column', InternalTraversal.dp_clauseelement),
+        ('end', InternalTraversal.dp_clauseelement),
+        ('width', InternalTraversal.dp_plain_obj),
+    ]
+
+    def __init__(self, column, end: date, width: int = 1):
+        self.column = column
+        self.end = literal(end.isoformat())
+        self.width = width
+
+
+@compiles(PeriodsBefore)
+def _compile_periods_before(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    end = compiler.process(element.end, **kw)
+    return f'((TO_DAYS({end}) - TO_DAYS({column})) DIV {element.width})'
+
+
+@compiles(PeriodsBefore, 'sqlite')
+def _compile_periods_before_sqlite(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    end = compiler.process(element.end, **kw)
+    # date() 去掉时分秒后两边的 julianday 都是 .5 结尾，差值就是整天数
+    return f'(CAST(julianday({end}) - julianday(date({column})) AS INTEGER) / {element.width})'
+
+
+@compiles(PeriodsBefore, 'postgresql')
+def _compile_periods_before_pg(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    end = compiler.process(element.end, **kw)
+    return f'((CAST({end} AS DATE) - CAST({column} AS DATE)) / {element.width})'
+
+
+def demand_matrix(end: date, days: int):
+    """返回 (商品ID数组, 商品信息列, 出库矩阵)，矩阵最后一列是 end 当天。"""
+    products = db.session.execute(
+        select(Product.product_id, Product.product_code, Product.product_name, Product.supplier_id,
+               Product.stock, Product.min_stock, Product.max_stock)
+        .where(Product.status.notin_(('inactive', 'discontinued')))
+        .order_by(Product.product_id)
+    ).all()
+    ids = np.fromiter((p.product_id for p in products), dtype=np.int64, count=len(products))
+    matrix = np.zeros((len(products), days), dtype=np.float64)
+
+    since = datetime.combine(end - timedelta(days=days - 1), datetime.min.time())
+    until = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    Ops = archive.source(since, until)
+    day = PeriodsBefore(Ops.created_at, end)
+    rows = db.session.connection().execute(
+        select(Ops.product_id, day, func.sum(Ops.quantity))
+        .where(Ops.op_type == 'out', Ops.created_at >= since, Ops.created_at < until)
+        .group_by(Ops.product_id, day)
+    ).all()
+    if rows and len(ids):
+        pids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        offsets = days - 1 - np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+        qty = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+        idx = np.minimum(np.searchsorted(ids, pids), len(ids) - 1)
+        keep = (ids[idx] == pids) & (offsets >= 0) & (offsets < days)
+        np.add.at(matrix, (idx[keep], offsets[keep]), qty[keep])
+    return ids, products, matrix
+
+
+def reorder_points(matrix, stock, lead_time: int, review_days: int, service_level: float):
+    """对整张矩阵一次算出各商品的日需求、波动、安全库存、再订货点和建议补货量。"""
+    days = matrix.shape[1]
+    rate = 0.5 * matrix[:, -min(SHORT_WINDOW, days):].mean(axis=1) + 0.5 * matrix.mean(axis=1)
+    sigma = matrix.std(axis=1, ddof=1) if days > 1 else np.zeros(len(matrix))
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * sigma * np.sqrt(lead_time)
+    reorder_point = np.ceil(rate * lead_time + safety)
+    order_up_to = np.ceil(rate * (lead_time + review_days) + safety)
+    suggested = np.where(stock <= reorder_point, np.maximum(order_up_to - stock, 0), 0)
+    return {
+        'avg_daily_demand': rate,
+        'demand_std': sigma,
+        'safety_stock': np.ceil(safety),
+        'reorder_point': reorder_point,
+        'order_up_to': order_up_to,
+        'suggested_qty': suggested,
+    }
+
+
+def suggestions(end: date, days: int, lead_time: int, review_days: int, service_level: float,
+                include_all: bool = False) -> dict:
+    ids, products, matrix = demand_matrix(end, days)
+    stock = np.fromiter((p.stock or 0 for p in products), dtype=np.float64, count=len(products))
+    calc = reorder_points(matrix, stock, lead_time, review_days, service_level)
+
+    selected = np.arange(len(ids)) if include_all else np.flatnonzero(calc['suggested_qty'] > 0)
+    supplier_names = dict(db.session.query(Supplier.supplier_id, Supplier.supplier_name).all())
+    groups = {}
+    for i in selected.tolist():
+        p = products[i]
+        group = groups.setdefault(p.supplier_id, {
+            'supplier_id': p.supplier_id,
+            'supplier_name': supplier_names.get(p.supplier_id),
+            'total_suggested_qty': 0,
+            'items': [],
+        })
+        qty = int(calc['suggested_qty'][i])
+        group['total_suggested_qty'] += qty
+        group['items'].append({
+            'product_id': p.product_id,
+            'product_code': p.product_code,
+            'product_name': p.product_name,
+            'stock': p.stock,
+            'min_stock': p.min_stock,
+            'max_stock': p.max_stock,
+            'avg_daily_demand': round(float(calc['avg_daily_demand'][i]), 3),
+            'demand_std': round(float(calc['demand_std'][i]), 3),
+            'safety_stock': int(calc['safety_stock'][i]),
+            'reorder_point': int(calc['reorder_point'][i]),
+            'order_up_to': int(calc['order_up_to'][i]),
+            'suggested_qty': qty,
+        })
+    metrics.inc('forecast.products', len(ids))
+
+    return {
+        'as_of': end.isoformat(),
+        'params': {'days': days, 'lead_time_days': lead_time, 'review_days': review_days,
+                   'service_level': service_level},
+        'generated_at': datetime.utcnow().isoformat(),
+        'products_analyzed': int(len(ids)),
+        'products_to_reorder': int((calc['suggested_qty'] > 0).sum()),
+        # 没有供应商的商品归在 supplier_id 为 null 的组，排在最后
+        'suppliers': sorted(groups.values(), key=lambda g: (g['supplier_id'] is None, g['supplier_id'] or 0)),
+    }
+
+
+def _snapshot_path(app: Flask) -> str:
+    directory = app.config.get('REPORTS_DIR') or os.path.join(app.instance_path, 'reports')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, 'reorder_suggestions.json')
+
+
+def save_snapshot(app: Flask, result: dict) -> None:
+    path = _snapshot_path(app)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_snapshot(app: Flask, params: dict, as_of: date):
+    """读夜间任务算好的结果；参数或日期对不上就返回 None。"""
+    try:
+        with open(_snapshot_path(app), encoding='utf-8') as f:
+            result = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if result.get('params') != params or result.get('as_of') != as_of.isoformat():
+        return None
+    return result
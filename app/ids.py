@@ -0,0 +1,50 @@
+"""服务端生成的订单号：ULID 风格，按创建时间有序，多进程之间不用协调。
+
+26 位 Crockford Base32：前 10 位是毫秒时间戳，后 16 位是 80 位随机数。
+同一毫秒里再要就把随机部分 +1，保证本进程内严格递增；不同进程靠 80 位随机数区分。
+fork 之后子进程重置状态，gunicorn 预 fork 出来的 worker 不会从同一个随机数往上加。
+"""
+import os
+import secrets
+import threading
+import time
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _reset() -> None:
+    global _last_ms, _last_random
+    _last_ms = -1
+    _last_random = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 32)
+        chars.append(ALPHABET[rem])
+    return ''.join(reversed(chars))
+
+
+def new_id() -> str:
+    global _last_ms, _last_random
+    with _lock:
+        now = time.time_ns() // 1_000_000
+        if now > _last_ms:
+            _last_ms, _last_random = now, secrets.randbits(_RANDOM_BITS)
+        else:
+            # 同一毫秒（或时钟回拨）：沿用上一个时间戳，随机部分 +1
+            _last_random += 1
+            if _last_random >> _RANDOM_BITS:
+                _last_ms, _last_random = _last_ms + 1, secrets.randbits(_RANDOM_BITS)
+        ms, rand = _last_ms, _last_random
+    return _encode(ms, 10) + _encode(rand, 16)
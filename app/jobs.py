@@ -0,0 +1,138 @@
+"""后台任务：线程池执行耗时操作，状态和进度落盘，任何 worker 都能查询。
+
+任务函数签名为 fn(job, *args)，在应用上下文里执行，通过 job.update(...) 上报进度，
+返回值即任务结果（需可 JSON 序列化）。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import Flask
+
+from . import metrics
+
+
+class Job:
+    # 进度写盘的最小间隔，避免每行都写文件
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, registry, directory: str, kind: str, params=None):
+        self.registry = registry
+        self.directory = directory
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self._flushed_at = 0.0
+
+    def update(self, **progress) -> None:
+        self.progress.update(progress)
+        now = time.monotonic()
+        if now - self._flushed_at >= self.FLUSH_INTERVAL:
+            self._flushed_at = now
+            self.registry.persist(self)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRegistry:
+    def __init__(self, name: str, max_workers: int = 2, keep: int = 200):
+        self.name = name
+        self.max_workers = max_workers
+        self.keep = keep
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _job_dir(self, app: Flask) -> str:
+        path = os.path.join(app.config.get('JOBS_DIR') or os.path.join(app.instance_path, 'jobs'), self.name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def submit(self, app: Flask, kind: str, fn, *args, params=None) -> Job:
+        job = Job(self, self._job_dir(app), kind, params)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'job-{self.name}')
+            self._jobs[job.job_id] = job
+            self._evict()
+        self.persist(job)
+        self._executor.submit(self._run, app, job, fn, args)
+        metrics.inc(f'jobs.{self.name}.submitted')
+        return job
+
+    def complete(self, app: Flask, kind: str, result, params=None, **progress) -> Job:
+        """登记一个不用执行、结果现成的任务（比如命中了缓存），状态直接是 succeeded。"""
+        job = Job(self, self._job_dir(app), kind, params)
+        job.status = 'succeeded'
+        job.progress.update(progress)
+        job.result = result
+        job.finished_at = datetime.utcnow()
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        self.persist(job)
+        return job
+
+    def _run(self, app, job, fn, args):
+        job.status = 'running'
+        self.persist(job)
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                job.result = fn(job, *args)
+            job.status = 'succeeded'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = getattr(e, 'message', None) or str(e)
+            metrics.inc(f'jobs.{self.name}.failed')
+        finally:
+            job.finished_at = datetime.utcnow()
+            metrics.observe(f'jobs.{self.name}.seconds', time.perf_counter() - started)
+            self.persist(job)
+
+    def persist(self, job: Job) -> None:
+        path = os.path.join(job.directory, f'{job.job_id}.json')
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+
+    def get(self, app: Flask, job_id: str):
+        """按 id 取任务状态；本进程没有就读盘（任务可能是别的 worker 提交的）。"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        path = os.path.join(self._job_dir(app), f'{job_id}.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _evict(self) -> None:
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(len(self._jobs) - self.keep, 0)]:
+            self._jobs.pop(job.job_id, None)
@@ -0,0 +1,185 @@
+"""库存流水的本地列式副本：每列一个定长二进制文件，读时用 NumPy memmap 零拷贝映射。
+
+列：op_id、product_id、op_type（编码见 OP_TYPES）、quantity、unit_price、ts（UTC 秒）。
+流水只追加不修改，后台任务按 op_id 水位把新流水追加到各列文件末尾，再原子替换 meta.json；
+只追加 LEDGER_CACHE_LAG_SECONDS 秒之前创建的流水，还没提交的小 op_id 事务不会被水位越过
+（created_at 在 flush 时就定了，这个间隔要长过最长的事务和锁等待）；
+读的一方只映射 meta 里记录的行数，追加到一半的数据看不到。写只在跑定时任务的进程里进行。
+报表（如 daily_movements）先在缓存的数组上整体计算，水位之后的少量流水再查库补上，结果不滞后。
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import select
+
+from . import archive, db, metrics
+from .models import StockOperation
+
+OP_TYPES = ('in', 'out', 'adjust', 'transfer')
+COLUMNS = {
+    'op_id': np.int64,
+    'product_id': np.int32,
+    'op_type': np.uint8,
+    'quantity': np.int32,
+    'unit_price': np.float64,
+    'ts': np.int64,
+}
+EPOCH = datetime(1970, 1, 1)
+
+_write_lock = threading.Lock()
+
+
+def directory(app: Flask) -> str:
+    path = app.config.get('LEDGER_CACHE_DIR') or os.path.join(app.instance_path, 'ledger')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _read_meta(path: str) -> dict:
+    try:
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'count': 0, 'watermark': 0}
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    target = os.path.join(path, 'meta.json')
+    with open(f'{target}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(f'{target}.tmp', target)
+
+
+def load(app: Flask):
+    """返回 (各列 memmap 的 dict, 水位 op_id)；还没建过返回 (None, 0)。"""
+    path = directory(app)
+    meta = _read_meta(path)
+    count = meta['count']
+    if not count:
+        return None, meta['watermark']
+    columns = {
+        name: np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype, mode='r', shape=(count,))
+        for name, dtype in COLUMNS.items()
+    }
+    return columns, meta['watermark']
+
+
+def sync(app: Flask, batch_size: int = 50000, lag_seconds: int = None) -> int:
+    """把水位之后的流水追加进列文件，返回追加的行数。"""
+    started = time.perf_counter()
+    appended = 0
+    if lag_seconds is None:
+        lag_seconds = app.config.get('LEDGER_CACHE_LAG_SECONDS', 300)
+    horizon = datetime.utcnow() - timedelta(seconds=lag_seconds)
+    with _write_lock:
+        path = directory(app)
+        meta = _read_meta(path)
+        _truncate(path, meta['count'])
+        conn = db.session.connection()
+        while True:
+            Ops = archive.source_after(meta['watermark'])
+            rows = conn.execute(
+                select(Ops.op_id, Ops.product_id, Ops.op_type, Ops.quantity, Ops.unit_price, Ops.created_at)
+                .where(Ops.op_id > meta['watermark'])
+                .order_by(Ops.op_id)
+                .limit(batch_size)
+            ).all()
+            # 和小时汇总一样，水位只能连续往前推：遇到太新的流水就停在它前面，下次再来
+            ready = []
+            for row in rows:
+                if row.created_at is None or row.created_at > horizon:
+                    break
+                ready.append(row)
+            if not ready:
+                break
+            arrays = _to_arrays(ready)
+            for name, values in arrays.items():
+                with open(os.path.join(path, f'{name}.bin'), 'ab') as f:
+                    values.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            meta = {'count': meta['count'] + len(ready), 'watermark': int(arrays['op_id'][-1])}
+            _write_meta(path, meta)
+            appended += len(ready)
+        db.session.rollback()
+    metrics.inc('ledger_cache.appended', appended)
+    metrics.observe('ledger_cache.sync_seconds', time.perf_counter() - started)
+    return appended
+
+
+def _truncate(path: str, count: int) -> None:
+    """上次追加到一半就挂了的话，各列文件会比 meta 记录的长，先截回去。"""
+    for name, dtype in COLUMNS.items():
+        file = os.path.join(path, f'{name}.bin')
+        size = count * np.dtype(dtype).itemsize
+        if not os.path.exists(file):
+            open(file, 'wb').close()
+        if os.path.getsize(file) != size:
+            with open(file, 'r+b') as f:
+                f.truncate(size)
+
+
+def _to_arrays(rows) -> dict:
+    n = len(rows)
+    codes = {name: i for i, name in enumerate(OP_TYPES)}
+    return {
+        'op_id': np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+        'product_id': np.fromiter((r[1] for r in rows), dtype=np.int32, count=n),
+        'op_type': np.fromiter((codes[r[2]] for r in rows), dtype=np.uint8, count=n),
+        'quantity': np.fromiter((r[3] for r in rows), dtype=np.int32, count=n),
+        'unit_price': np.fromiter((float(r[4] or 0) for r in rows), dtype=np.float64, count=n),
+        'ts': np.fromiter((int((r[5] - EPOCH).total_seconds()) if r[5] else 0 for r in rows), dtype=np.int64, count=n),
+    }
+
+
+def to_ts(value: datetime) -> int:
+    return int((value - EPOCH).total_seconds())
+
+
+def daily_movements(app: Flask, start: datetime, end: datetime, product_id=None):
+    """[start, end] 内每天的入库、出库、调整（绝对值）数量，返回 (天数, 3) 的数组，行从 start 当天起。
+
+    缓存部分整体向量化，水位之后的流水查库补上。缓存还没建时返回 None。
+    """
+    columns, watermark = load(app)
+    if columns is None:
+        return None
+    first_day = to_ts(datetime.combine(start.date(), datetime.min.time())) // 86400
+    days = (end.date() - start.date()).days + 1
+    result = np.zeros((days, 3), dtype=np.int64)
+
+    ts = columns['ts']
+    mask = (ts >= to_ts(start)) & (ts <= to_ts(end))
+    if product_id:
+        mask &= columns['product_id'] == product_id
+    _accumulate(result, ts[mask] // 86400 - first_day, columns['op_type'][mask], columns['quantity'][mask])
+
+    stmt = (
+        select(StockOperation.created_at, StockOperation.op_type, StockOperation.quantity)
+        .where(StockOperation.op_id > watermark, StockOperation.created_at >= start, StockOperation.created_at <= end)
+    )
+    if product_id:
+        stmt = stmt.where(StockOperation.product_id == product_id)
+    tail = db.session.execute(stmt).all()
+    if tail:
+        codes = {name: i for i, name in enumerate(OP_TYPES)}
+        day = np.array([to_ts(r[0]) // 86400 - first_day for r in tail], dtype=np.int64)
+        _accumulate(result, day, np.array([codes[r[1]] for r in tail], dtype=np.uint8),
+                    np.array([r[2] for r in tail], dtype=np.int64))
+    metrics.inc('ledger_cache.tail_rows', len(tail))
+    return result
+
+
+def _accumulate(result, day, op_type, quantity) -> None:
+    days = len(result)
+    keep = (day >= 0) & (day < days)
+    day, op_type, quantity = day[keep], op_type[keep], quantity[keep].astype(np.int64)
+    # 和原来逐条统计一致：in、out 各记各的，其余类型按绝对值记到调整
+    for slot, selected in ((0, op_type == 0), (1, op_type == 1), (2, op_type >= 2)):
+        values = np.abs(quantity[selected]) if slot == 2 else quantity[selected]
+        result[:, slot] += np.bincount(day[selected], weights=values, minlength=days).astype(np.int64)
@@ -0,0 +1,73 @@
+"""进程内运行指标：计数器、耗时统计和按需计算的瞬时值。
+
+gunicorn 多 worker 时每个进程各记各的，GET /api/metrics 返回当前 worker 的数据。
+"""
+import threading
+from collections import defaultdict
+
+from flask import Blueprint
+
+from .utils import Response, role_required
+
+bp = Blueprint('metrics', __name__)
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}
+_gauges = {}
+
+
+def inc(name: str, value=1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float) -> None:
+    """记录一次耗时/大小类观测值，汇总成 count/sum/max。"""
+    with _lock:
+        stat = _timings.get(name)
+        if stat is None:
+            _timings[name] = {'count': 1, 'sum': value, 'max': value}
+        else:
+            stat['count'] += 1
+            stat['sum'] += value
+            stat['max'] = max(stat['max'], value)
+
+
+def register_gauge(name: str, fn) -> None:
+    """注册一个瞬时值，取快照时才调用 fn() 计算。"""
+    _gauges[name] = fn
+
+
+def ratio(hits: int, total: int):
+    return round(hits / total, 4) if total else None
+
+
+def snapshot_counters(prefix: str = '') -> dict:
+    with _lock:
+        return {k: v for k, v in _counters.items() if k.startswith(prefix)}
+
+
+def snapshot() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        timings = {k: dict(v, avg=v['sum'] / v['count']) for k, v in _timings.items()}
+    gauges = {}
+    for name, fn in list(_gauges.items()):
+        try:
+            gauges[name] = fn()
+        except Exception as e:  # 指标不能把接口搞挂
+            gauges[name] = f'error: {e}'
+    return {'counters': counters, 'timings': timings, 'gauges': gauges}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+
+@bp.route('', methods=['GET'])
+@role_required(['admin'])
+def get_metrics():
+    return Response.success(snapshot())
@@ -21,6 +21,9 @@ class Category(db.Model):
     category_id = db.Column(db.Integer, primary_key=True)
     category_name = db.Column(db.String(50), nullable=False, unique=True)
     description = db.Column(db.String(200))
+    # 冗余计数，由写路径维护，见 app/counters.py
+    product_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='商品数')
+    total_stock = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='库存合计')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -36,6 +39,9 @@ class Supplier(db.Model):
     phone = db.Column(db.String(20))
     email = db.Column(db.String(100))
     address = db.Column(db.String(200))
+    # 冗余计数，由写路径维护，见 app/counters.py
+    product_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='商品数')
+    total_stock = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='库存合计')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -65,6 +71,11 @@ class Product(db.Model):
     stock_operations = db.relationship('StockOperation', backref='product', lazy=True)
     inventory_summaries = db.relationship('InventorySummary', backref='product', lazy=True)
 
+    __table_args__ = (
+        # 编码索引每次查询前取 max(updated_at) 判断商品有没有改过
+        db.Index('idx_products_updated', 'updated_at'),
+    )
+
 # 订单表
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -78,6 +89,11 @@ class Order(db.Model):
     # 关联关系
     stock_operations = db.relationship('StockOperation', backref='order', lazy=True)
 
+    __table_args__ = (
+        # 订单列表按创建时间倒序分页
+        db.Index('idx_orders_created', 'created_at'),
+    )
+
 # 库存操作表（审计日志）
 class StockOperation(db.Model):
     __tablename__ = 'stock_operations'
@@ -98,6 +114,11 @@ class StockOperation(db.Model):
     notes = db.Column(db.String(500), comment='备注')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
 
+    __table_args__ = (
+        # 按商品查某时刻之前最后一条流水（stock_as_of）走这个索引
+        db.Index('idx_stock_ops_product_created', 'product_id', 'created_at'),
+    )
+
 # 库存汇总表（物化视图）
 class InventorySummary(db.Model):
     __tablename__ = 'inventory_summary'
@@ -115,3 +136,94 @@ class InventorySummary(db.Model):
     __table_args__ = (
         db.UniqueConstraint('product_id', 'summary_date', name='uk_product_date'),
     )
+
+# 库存估值检查点（每个商品在某日日末的移动加权平均成本和 FIFO 批次）
+class ValuationCheckpoint(db.Model):
+    __tablename__ = 'valuation_checkpoints'
+    checkpoint_id = db.Column(db.Integer, primary_key=True, comment='检查点ID')
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False, comment='商品ID')
+    checkpoint_date = db.Column(db.Date, nullable=False, comment='检查点日期（含当日全部流水）')
+    last_op_id = db.Column(db.Integer, nullable=False, comment='已处理到的最后一条流水ID')
+    quantity = db.Column(db.Integer, nullable=False, comment='结存数量')
+    avg_cost = db.Column(db.Numeric(14, 4), nullable=False, comment='移动加权平均单位成本')
+    fifo_layers = db.Column(db.Text, nullable=False, comment='FIFO 剩余批次 JSON：[[数量, 单价], ...]')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'checkpoint_date', name='uk_valuation_product_date'),
+    )
+
+# 归档的库存操作：列与 stock_operations 一一对应（便于 UNION ALL），不挂外键
+class StockOperationArchive(db.Model):
+    __tablename__ = 'stock_operations_archive'
+    op_id = db.Column('operation_id', db.Integer, primary_key=True, autoincrement=False, comment='操作ID')
+    product_id = db.Column(db.Integer, nullable=False, comment='商品ID')
+    op_type = db.Column('type', db.Enum('in', 'out', 'adjust', 'transfer', name='op_type_enum'), nullable=False, comment='操作类型')
+    quantity = db.Column(db.Integer, nullable=False, comment='操作数量')
+    stock_before = db.Column('before_quantity', db.Integer, nullable=False, comment='操作前库存')
+    stock_after = db.Column('after_quantity', db.Integer, nullable=False, comment='操作后库存')
+    order_id = db.Column(db.String(50), comment='关联订单ID')
+    unit_price = db.Column(db.Numeric(10, 2), nullable=False, comment='单价')
+    total_price = db.Column(db.Numeric(10, 2), nullable=False, comment='总价')
+    operation_date = db.Column(db.DateTime, comment='操作时间')
+    operator_id = db.Column(db.Integer, nullable=False, comment='操作人ID')
+    user_id = db.Column(db.Integer, comment='用户ID')
+    operator_action = db.Column(db.String(50), nullable=False, comment='操作动作')
+    reason = db.Column(db.Enum('purchase', 'sale', 'adjustment', 'damaged', 'expired', 'transfer', name='stock_reason_enum'), comment='操作原因')
+    notes = db.Column(db.String(500), comment='备注')
+    created_at = db.Column(db.DateTime, comment='创建时间')
+
+    __table_args__ = (
+        db.Index('idx_stock_ops_archive_product_created', 'product_id', 'created_at'),
+        db.Index('idx_stock_ops_archive_created', 'created_at'),
+        db.Index('idx_stock_ops_archive_order', 'order_id'),
+    )
+
+# 归档流水的月度汇总：每个商品每月每种操作一行
+class StockOperationMonthly(db.Model):
+    __tablename__ = 'stock_operation_monthly'
+    rollup_id = db.Column(db.Integer, primary_key=True, comment='汇总ID')
+    product_id = db.Column(db.Integer, nullable=False, comment='商品ID')
+    month = db.Column(db.Date, nullable=False, comment='月份（当月 1 日）')
+    op_type = db.Column('type', db.Enum('in', 'out', 'adjust', 'transfer', name='op_type_enum'), nullable=False, comment='操作类型')
+    op_count = db.Column(db.Integer, nullable=False, default=0, comment='操作笔数')
+    quantity = db.Column(db.Integer, nullable=False, default=0, comment='数量合计（调整按原值带符号）')
+    abs_quantity = db.Column(db.Integer, nullable=False, default=0, comment='数量绝对值合计')
+    total_price = db.Column(db.Numeric(14, 2), nullable=False, default=0, comment='金额合计')
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'month', 'type', name='uk_stock_monthly_product_month_type'),
+    )
+
+# 库存流水归档任务的运行记录：截止日之前的流水可能已经搬到归档表
+class StockOperationArchiveRun(db.Model):
+    __tablename__ = 'stock_operation_archive_runs'
+    run_id = db.Column(db.Integer, primary_key=True, comment='运行ID')
+    cutoff = db.Column(db.Date, nullable=False, index=True, comment='截止日（早于它的流水归档）')
+    moved_ops = db.Column(db.Integer, nullable=False, default=0, comment='搬走的流水条数')
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, comment='开始时间')
+    finished_at = db.Column(db.DateTime, comment='结束时间')
+
+# 库存流水小时汇总：每个商品每小时每种操作一行，由定时任务按 op_id 水位增量累加
+class StockMovementHourly(db.Model):
+    __tablename__ = 'stock_movement_hourly'
+    rollup_id = db.Column(db.Integer, primary_key=True, comment='汇总ID')
+    product_id = db.Column(db.Integer, nullable=False, comment='商品ID')
+    hour = db.Column(db.DateTime, nullable=False, comment='小时（整点）')
+    op_type = db.Column('type', db.Enum('in', 'out', 'adjust', 'transfer', name='op_type_enum'), nullable=False, comment='操作类型')
+    op_count = db.Column(db.Integer, nullable=False, default=0, comment='操作笔数')
+    quantity = db.Column(db.Integer, nullable=False, default=0, comment='数量合计（调整按原值带符号）')
+    abs_quantity = db.Column(db.Integer, nullable=False, default=0, comment='数量绝对值合计')
+    total_price = db.Column(db.Numeric(14, 2), nullable=False, default=0, comment='金额合计')
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'hour', 'type', name='uk_stock_hourly_product_hour_type'),
+        db.Index('idx_stock_hourly_hour', 'hour'),
+    )
+
+# 增量汇总任务的水位：已经累加到的最后一条流水ID
+class RollupWatermark(db.Model):
+    __tablename__ = 'rollup_watermarks'
+    name = db.Column(db.String(50), primary_key=True, comment='汇总名')
+    last_op_id = db.Column(db.Integer, nullable=False, default=0, comment='已汇总到的最后一条流水ID')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
@@ -1,8 +1,13 @@
 from flask import Blueprint, request, g
-from .models import Order, Product, StockOperation
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from .models import Order, StockOperation
 from . import db
-from .utils import role_required, Response, ValidationError, NotFoundError
-from .schemas import order_to_dict, stock_operation_to_dict
+from .utils import role_required, Response, ValidationError, NotFoundError, parse_ids
+from .schemas import ORDER_FIELDS, load_options, order_to_dict, parse_fields, stock_operation_to_dict
+from .statements import PRODUCT_FOR_UPDATE
+from .transactions import transactional
+from . import archive, cache, counters, ids
 from decimal import Decimal
 from datetime import datetime
 
@@ -20,23 +25,24 @@ def update_product_status(product):
 @role_required(['admin', 'purchaser', 'cashier'])
 def create_order():
     data = request.json or {}
-    order_id = data.get('order_id')
+    # 不传订单号时由服务端生成（按时间有序）；客户端自带的照收，重复靠主键冲突发现
+    order_id = data.get('order_id') or ids.new_id()
     order_type = data.get('order_type')
     items = data.get('items')
     
     # 验证参数
-    if not order_id:
-        raise ValidationError('Order ID is required')
+    if not isinstance(order_id, str) or len(order_id) > 50:
+        raise ValidationError('Order ID must be a string of at most 50 characters')
     if order_type not in ['purchase', 'sale']:
         raise ValidationError('Order type must be either purchase or sale')
     if not items or not isinstance(items, list):
         raise ValidationError('Items must be a non-empty list')
     
-    # 检查订单ID是否已存在
-    if Order.query.get(order_id):
-        raise ValidationError('Order ID already exists')
-    
-    with db.session.begin():
+    operator_id = g.current_user.user_id
+
+    # 整单一个事务单元，遇到死锁/锁超时会自动重放
+    @transactional
+    def unit_of_work():
         # 创建订单
         order = Order(
             order_id=order_id,
@@ -48,6 +54,7 @@ def create_order():
         db.session.flush()
         
         total = Decimal('0.00')
+        deltas = counters.Deltas()
         
         # 处理订单商品
         for item in items:
@@ -64,7 +71,7 @@ def create_order():
                 raise ValidationError('Unit price cannot be negative')
             
             # 使用行锁获取商品
-            product = db.session.query(Product).filter_by(product_id=product_id).with_for_update().first()
+            product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
             if not product:
                 raise NotFoundError(f'Product {product_id} not found')
             
@@ -86,6 +93,7 @@ def create_order():
             
             # 更新商品状态
             update_product_status(product)
+            deltas.add(product.category_id, product.supplier_id, stock=product.stock - before_stock)
             
             # 记录库存操作
             reason_enum = 'purchase' if order_type == 'purchase' else 'sale'
@@ -98,8 +106,8 @@ def create_order():
                 order_id=order.order_id,
                 unit_price=unit_price,
                 total_price=item_total,
-                operator_id=g.current_user.user_id,
-                user_id=g.current_user.user_id,
+                operator_id=operator_id,
+                user_id=operator_id,
                 operator_action=f'order_{order_type}',
                 reason=reason_enum,
                 notes=f'order {order_id}',
@@ -108,11 +116,23 @@ def create_order():
 
             total += item_total
         
+        # 分类/供应商计数整单合并后一次写出
+        deltas.apply()
+        
         # 更新订单总金额和状态
         order.total_amount = total
         order.status = 'completed'  # 直接完成订单
-    
-    return Response.success({'order_id': order.order_id})
+        return order.order_id
+
+    try:
+        order_id = unit_of_work()
+    except IntegrityError:
+        db.session.rollback()
+        if db.session.get(Order, order_id) is not None:
+            raise ValidationError('Order ID already exists')
+        raise
+    cache.bump('orders', 'stock')
+    return Response.success({'order_id': order_id})
 
 @bp.route('', methods=['GET'])
 @role_required(['admin', 'stock_operator', 'purchaser', 'cashier', 'finance', 'viewer'])
@@ -124,6 +144,7 @@ def list_orders():
     keyword = (request.args.get('keyword') or '').strip()
     start_date = (request.args.get('start_date') or '').strip()
     end_date = (request.args.get('end_date') or '').strip()
+    fields = parse_fields(request.args.get('fields'), ORDER_FIELDS)
 
     def parse_dt(value: str, is_end: bool):
         if not value:
@@ -136,7 +157,7 @@ def list_orders():
         except ValueError:
             return None
     
-    q = Order.query
+    q = Order.query.options(*load_options(Order, ORDER_FIELDS, fields))
     
     # 过滤条件
     if keyword:
@@ -152,17 +173,49 @@ def list_orders():
     if end_dt:
         q = q.filter(Order.created_at <= end_dt)
     
-    # 按创建时间倒序排列
-    q = q.order_by(Order.created_at.desc())
+    # 按创建时间倒序排列（走 created_at 索引）；同一时刻按订单号，服务端生成的订单号本身按时间有序
+    q = q.order_by(Order.created_at.desc(), Order.order_id.desc())
     
     total = q.count()
     items = q.offset((page-1)*size).limit(size).all()
     
     return Response.pagination(
-        [order_to_dict(item) for item in items], 
+        [order_to_dict(item, fields) for item in items], 
         total, page, size
     )
 
+@bp.route('/batch', methods=['GET'])
+@role_required(['admin', 'stock_operator', 'purchaser', 'cashier', 'finance', 'viewer'])
+def get_orders_batch():
+    """按 ids 批量取订单，include=operations 时一并带出流水（共两条查询）"""
+    order_ids = parse_ids(request.args.get('ids'))
+    include = {x.strip() for x in (request.args.get('include') or '').split(',') if x.strip()}
+    if include - {'operations'}:
+        raise ValidationError('include only supports operations')
+
+    orders = {o.order_id: o for o in Order.query.filter(Order.order_id.in_(order_ids)).all()}
+    items = [order_to_dict(orders[oid]) for oid in order_ids if oid in orders]
+    if 'operations' in include and items:
+        grouped = {}
+        # 流水和订单同时写入，最早的订单在归档边界之前才需要查归档表
+        Ops = archive.source(min((o.created_at for o in orders.values() if o.created_at), default=None))
+        operations = (
+            db.session.query(Ops)
+            .options(joinedload(Ops.product))
+            .filter(Ops.order_id.in_(list(orders)))
+            .order_by(Ops.op_id)
+            .all()
+        )
+        for op in operations:
+            grouped.setdefault(op.order_id, []).append(stock_operation_to_dict(op))
+        for item in items:
+            item['operations'] = grouped.get(item['order_id'], [])
+
+    return Response.success({
+        'items': items,
+        'missing': [oid for oid in order_ids if oid not in orders],
+    })
+
 @bp.route('/<string:order_id>', methods=['GET'])
 @role_required(['admin', 'stock_operator', 'purchaser', 'cashier', 'finance', 'viewer'])
 def get_order(order_id):
@@ -175,10 +228,12 @@ def get_order(order_id):
 @role_required(['admin', 'stock_operator', 'finance', 'viewer'])
 def get_order_operations(order_id):
     # 验证订单是否存在
-    if not Order.query.get(order_id):
+    order = Order.query.get(order_id)
+    if not order:
         raise NotFoundError('Order not found')
     
-    operations = StockOperation.query.filter_by(order_id=order_id).all()
+    Ops = archive.source(order.created_at)
+    operations = db.session.query(Ops).filter(Ops.order_id == order_id).all()
     return Response.success([stock_operation_to_dict(op) for op in operations])
 
 @bp.route('/<string:order_id>/status', methods=['PUT'])
@@ -208,5 +263,6 @@ def update_order_status(order_id):
     # 更新订单状态
     order.status = new_status
     db.session.commit()
+    cache.bump('orders')
     
     return Response.success(order_to_dict(order))
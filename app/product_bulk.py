@@ -0,0 +1,176 @@
+"""商品批量改价/改属性：整批一条 UPDATE 语句，不逐个加载商品。
+
+价格变更支持 set（设为定值）、percent（按百分比涨跌）、absolute（加减固定金额），
+结果按 rounding 规则取整并兜底不小于 0；其余字段只支持直接设值。
+"""
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import Numeric, case, cast, func, literal, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from . import db
+from .models import Product
+from .product_import import PRICE_FIELDS, PRODUCT_STATUSES
+from .utils import ValidationError
+
+PRICE_OPS = ('set', 'percent', 'absolute')
+ROUNDING_MODES = ('half_up', 'down', 'up')
+MAX_CODES = 5000
+PREVIEW_SIZE = 20
+
+
+class _RoundTo(ColumnElement):
+    """按 mode 把数值取整到 precision 位小数，SQLite 没有 FLOOR/CEIL 单独编译。"""
+    inherit_cache = True
+    type = Numeric(10, 2)
+    # precision/mode 决定生成的 SQL，必须进编译缓存的 key
+    _traverse_internals = [
+        ('expr', InternalTraversal.dp_clauseelement),
+        ('precision', InternalTraversal.dp_plain_obj),
+        ('mode', InternalTraversal.dp_plain_obj),
+    ]
+
+    def __init__(self, expr, precision: int, mode: str):
+        self.expr = expr
+        self.precision = precision
+        self.mode = mode
+
+
+@compiles(_RoundTo)
+def _compile_round(element, compiler, **kw):
+    expr = compiler.process(element.expr, **kw)
+    p = element.precision
+    if element.mode == 'half_up':
+        return f'ROUND({expr}, {p})'
+    fn = 'FLOOR' if element.mode == 'down' else 'CEILING'
+    return f'({fn}(({expr}) * {10 ** p}) / {10 ** p})'
+
+
+@compiles(_RoundTo, 'sqlite')
+def _compile_round_sqlite(element, compiler, **kw):
+    p = element.precision
+    if element.mode == 'half_up':
+        return f'ROUND({compiler.process(element.expr, **kw)}, {p})'
+
+    # 每次出现都要重新 process，位置参数（?）才会按出现次数绑定；
+    # SQLite 用浮点算，先收掉 2.2000000000000002 这类尾差再取整
+    def scaled():
+        return f'ROUND(({compiler.process(element.expr, **kw)}) * {10 ** p}, 6)'
+
+    # 价格不为负，CAST AS INTEGER 即向下取整；向上取整再补一个"是否有余数"
+    if element.mode == 'down':
+        return f'(CAST({scaled()} AS INTEGER) / {10 ** p}.0)'
+    return f'((CAST({scaled()} AS INTEGER) + ({scaled()} > CAST({scaled()} AS INTEGER))) / {10 ** p}.0)'
+
+
+def _decimal(value, field):
+    try:
+        value = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValidationError(f'{field} must be a number')
+    if not value.is_finite():
+        raise ValidationError(f'{field} must be a finite number')
+    return value
+
+
+def _non_negative_int(value, field):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f'{field} must be an integer')
+    if value < 0:
+        raise ValidationError(f'{field} cannot be negative')
+    return value
+
+
+def build_filter(raw):
+    if not isinstance(raw, dict) or not raw:
+        raise ValidationError('filter is required')
+    conditions = []
+    if raw.get('category_id') is not None:
+        conditions.append(Product.category_id == _non_negative_int(raw['category_id'], 'category_id'))
+    if raw.get('supplier_id') is not None:
+        conditions.append(Product.supplier_id == _non_negative_int(raw['supplier_id'], 'supplier_id'))
+    if raw.get('status') is not None:
+        if raw['status'] not in PRODUCT_STATUSES:
+            raise ValidationError(f"Invalid status {raw['status']}")
+        conditions.append(Product.status == raw['status'])
+    if raw.get('product_codes') is not None:
+        codes = raw['product_codes']
+        if not isinstance(codes, list) or not codes:
+            raise ValidationError('product_codes must be a non-empty list')
+        if len(codes) > MAX_CODES:
+            raise ValidationError(f'At most {MAX_CODES} product_codes per request')
+        conditions.append(Product.product_code.in_([str(c) for c in codes]))
+    if not conditions and raw.get('all') is not True:
+        # 防止手滑改全表：真要全表改得显式写 all: true
+        raise ValidationError('filter must contain at least one condition, or "all": true')
+    return conditions
+
+
+def build_values(raw_set, rounding):
+    if not isinstance(raw_set, dict) or not raw_set:
+        raise ValidationError('set is required')
+    rounding = rounding or {}
+    if not isinstance(rounding, dict):
+        raise ValidationError('rounding must be an object')
+    mode = rounding.get('mode', 'half_up')
+    if mode not in ROUNDING_MODES:
+        raise ValidationError(f'rounding.mode must be one of {", ".join(ROUNDING_MODES)}')
+    precision = _non_negative_int(rounding.get('precision', 2), 'rounding.precision')
+    if precision > 2:
+        raise ValidationError('rounding.precision must be 0, 1 or 2')
+
+    values = {}
+    for field, spec in raw_set.items():
+        if field in PRICE_FIELDS:
+            if not isinstance(spec, dict) or len(spec) != 1 or next(iter(spec)) not in PRICE_OPS:
+                raise ValidationError(f'{field} must be one of {{"set": x}}, {{"percent": x}}, {{"absolute": x}}')
+            op, amount = next(iter(spec.items()))
+            amount = _decimal(amount, f'{field}.{op}')
+            col = getattr(Product, field)
+            if op == 'set':
+                if amount < 0:
+                    raise ValidationError(f'{field} cannot be negative')
+                expr = literal(amount, Numeric(10, 2))
+            elif op == 'percent':
+                expr = col * literal(1 + amount / 100, Numeric(12, 6))
+            else:
+                expr = col + literal(amount, Numeric(10, 2))
+            rounded = _RoundTo(expr, precision, mode)
+            values[field] = case((rounded < 0, literal(Decimal('0.00'), Numeric(10, 2))), else_=rounded)
+        elif field in ('min_stock', 'max_stock'):
+            values[field] = _non_negative_int(spec, field)
+        elif field == 'status':
+            if spec not in PRODUCT_STATUSES:
+                raise ValidationError(f'Invalid status {spec}')
+            values[field] = spec
+        elif field == 'storage_location':
+            values[field] = (str(spec).strip() or None) if spec is not None else None
+        else:
+            raise ValidationError(f'Field {field} cannot be bulk updated')
+
+    if 'min_stock' in values and 'max_stock' in values and values['min_stock'] > values['max_stock']:
+        raise ValidationError('min_stock cannot be greater than max_stock')
+    return values
+
+
+def preview(conditions, values):
+    """dry-run：命中行数 + 前几行改前/改后的价格。"""
+    total = db.session.execute(select(func.count()).select_from(Product).where(*conditions)).scalar()
+    columns = [Product.product_id, Product.product_code]
+    for field in PRICE_FIELDS:
+        if field in values:
+            columns += [getattr(Product, field).label(field), cast(values[field], Numeric(10, 2)).label(f'new_{field}')]
+    rows = db.session.execute(
+        select(*columns).where(*conditions).order_by(Product.product_id).limit(PREVIEW_SIZE)
+    ).mappings().all()
+    sample = [{k: float(v) if isinstance(v, Decimal) else v for k, v in row.items()} for row in rows]
+    return total, sample
+
+
+def apply(conditions, values) -> int:
+    stmt = update(Product).where(*conditions).values(**values).execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount
@@ -0,0 +1,231 @@
+"""商品批量导入：流式读 CSV / NDJSON，分批校验，按 product_code 分块 upsert。
+
+一次只在内存里放一批行（IMPORT_BATCH_SIZE），分类/供应商名称、已有编码
+每批各查一次；每批一个事务。行级错误带行号返回，最多 PRODUCT_IMPORT_MAX_ERRORS 条。
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from . import counters, db
+from .models import Category, Product, Supplier
+from .transactions import transactional
+from .utils import ValidationError
+
+PRODUCT_STATUSES = {'active', 'inactive', 'out_of_stock', 'discontinued', 'pending'}
+TEXT_FIELDS = ('product_name', 'storage_location')
+PRICE_FIELDS = ('purchase_price', 'sale_price')
+INT_FIELDS = ('min_stock', 'max_stock')
+# 新建商品必须提供的字段（与 create_product 一致，分类可以给 id 或名称）
+REQUIRED_ON_CREATE = ('product_name', 'category_id', 'purchase_price', 'sale_price')
+
+
+class RowError(Exception):
+    pass
+
+
+def iter_rows(stream, fmt: str):
+    """逐行产出 (行号, dict)；stream 是二进制流。"""
+    if fmt not in ('csv', 'ndjson'):
+        raise ValidationError('format must be csv or ndjson')
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            # 表头是第 1 行，数据从第 2 行开始
+            for lineno, row in enumerate(csv.DictReader(text), start=2):
+                yield lineno, row
+        else:
+            for lineno, line in enumerate(text, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield lineno, None
+                    continue
+                yield lineno, row if isinstance(row, dict) else None
+    finally:
+        # 别让 wrapper 被回收时顺手关掉底层流，流归调用方管
+        text.detach()
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def normalize_row(raw):
+    """校验并转换一行，返回只含提供了的字段的 dict。"""
+    if raw is None:
+        raise RowError('Malformed row')
+    code = raw.get('product_code')
+    if _blank(code):
+        raise RowError('product_code is required')
+    row = {'product_code': str(code).strip()}
+
+    for f in TEXT_FIELDS:
+        if not _blank(raw.get(f)):
+            row[f] = str(raw[f]).strip()
+    for f in PRICE_FIELDS:
+        if not _blank(raw.get(f)):
+            try:
+                value = Decimal(str(raw[f]).strip())
+            except InvalidOperation:
+                raise RowError(f'{f} must be a number')
+            if value < 0:
+                raise RowError(f'{f} cannot be negative')
+            row[f] = value.quantize(Decimal('0.01'))
+    for f in INT_FIELDS + ('category_id', 'supplier_id'):
+        if not _blank(raw.get(f)):
+            try:
+                row[f] = int(str(raw[f]).strip())
+            except ValueError:
+                raise RowError(f'{f} must be an integer')
+    for f in ('category_name', 'supplier_name'):
+        if not _blank(raw.get(f)):
+            row[f] = str(raw[f]).strip()
+    if not _blank(raw.get('status')):
+        status = str(raw['status']).strip()
+        if status not in PRODUCT_STATUSES:
+            raise RowError(f'Invalid status {status}')
+        row['status'] = status
+    return row
+
+
+def _resolve(model, id_col, name_col, rows, id_key, name_key):
+    """一次查询解析一批行里出现的 id/名称，返回 (存在的 id 集合, 名称 -> id)。"""
+    ids = {r[id_key] for r in rows if id_key in r}
+    names = {r[name_key] for r in rows if name_key in r and id_key not in r}
+    if not ids and not names:
+        return set(), {}
+    found = db.session.query(id_col, name_col).filter(or_(id_col.in_(ids), name_col.in_(names))).all()
+    by_name = {}
+    # 名称不唯一时取 id 最小的那条
+    for row_id, name in sorted(found):
+        by_name.setdefault(name, row_id)
+    return {row_id for row_id, _ in found}, by_name
+
+
+class ProductImporter:
+    def __init__(self, operator_id: int, batch_size: int = 1000, max_errors: int = 1000):
+        self.operator_id = operator_id
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.stats = {'processed': 0, 'created': 0, 'updated': 0, 'failed': 0}
+        self.errors = []
+        self.errors_truncated = False
+
+    def _error(self, lineno, code, message):
+        self.stats['failed'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': lineno, 'product_code': code, 'message': message})
+        else:
+            self.errors_truncated = True
+
+    def run(self, rows, progress=None) -> dict:
+        batch = []
+        for lineno, raw in rows:
+            batch.append((lineno, raw))
+            if len(batch) >= self.batch_size:
+                self._process(batch)
+                batch = []
+                if progress:
+                    progress(dict(self.stats))
+        if batch:
+            self._process(batch)
+        if progress:
+            progress(dict(self.stats))
+        return self.result()
+
+    def result(self) -> dict:
+        errors = sorted(self.errors, key=lambda e: e['row'])
+        return dict(self.stats, errors=errors, errors_truncated=self.errors_truncated)
+
+    def _process(self, batch):
+        valid = []
+        for lineno, raw in batch:
+            try:
+                valid.append((lineno, normalize_row(raw)))
+            except RowError as e:
+                code = raw.get('product_code') if isinstance(raw, dict) else None
+                self._error(lineno, code, str(e))
+
+        if valid:
+            try:
+                created, updated, row_errors = self._upsert(valid)
+            except IntegrityError:
+                # 多半是并发导入撞了同一个编码，整批回滚，行级报错后继续下一批
+                created, updated = 0, 0
+                row_errors = [(lineno, row['product_code'], 'Conflicting concurrent write, batch rolled back')
+                              for lineno, row in valid]
+            self.stats['created'] += created
+            self.stats['updated'] += updated
+            for lineno, code, message in row_errors:
+                self._error(lineno, code, message)
+        self.stats['processed'] += len(batch)
+
+    @transactional
+    def _upsert(self, valid):
+        rows = [r for _, r in valid]
+        category_ids, categories = _resolve(Category, Category.category_id, Category.category_name,
+                                            rows, 'category_id', 'category_name')
+        supplier_ids, suppliers = _resolve(Supplier, Supplier.supplier_id, Supplier.supplier_name,
+                                           rows, 'supplier_id', 'supplier_name')
+        codes = {r['product_code'] for r in rows}
+        existing = {
+            code: (product_id, (category_id, supplier_id), stock)
+            for code, product_id, category_id, supplier_id, stock in db.session.query(
+                Product.product_code, Product.product_id, Product.category_id, Product.supplier_id, Product.stock
+            ).filter(Product.product_code.in_(codes))
+        }
+
+        inserts, updates, row_errors = {}, {}, []
+        for lineno, row in valid:
+            code = row['product_code']
+            try:
+                self._resolve_refs(row, category_ids, categories, 'category_id', 'category_name', 'Category')
+                self._resolve_refs(row, supplier_ids, suppliers, 'supplier_id', 'supplier_name', 'Supplier')
+            except RowError as e:
+                row_errors.append((lineno, code, str(e)))
+                continue
+
+            if code in existing:
+                # 同一批里重复出现的编码，后出现的覆盖先出现的字段
+                updates.setdefault(code, {'product_id': existing[code][0]}).update(row)
+            elif code in inserts:
+                inserts[code].update(row)
+            else:
+                missing = [f for f in REQUIRED_ON_CREATE if f not in row]
+                if missing:
+                    row_errors.append((lineno, code, f'{missing[0]} is required for new products'))
+                    continue
+                inserts[code] = dict(row, created_by=self.operator_id)
+
+        deltas = counters.Deltas()
+        for row in inserts.values():
+            deltas.add(row['category_id'], row.get('supplier_id'), products=1)
+        for code, row in updates.items():
+            _, refs, stock = existing[code]
+            deltas.move(refs, (row.get('category_id', refs[0]), row.get('supplier_id', refs[1])), stock)
+
+        if inserts:
+            db.session.bulk_insert_mappings(Product, list(inserts.values()))
+        if updates:
+            db.session.bulk_update_mappings(Product, list(updates.values()))
+        deltas.apply()
+        return len(inserts), len(updates), row_errors
+
+    @staticmethod
+    def _resolve_refs(row, known_ids, by_name, id_key, name_key, label):
+        name = row.pop(name_key, None)
+        if id_key in row:
+            if row[id_key] not in known_ids:
+                raise RowError(f'{label} {row[id_key]} not found')
+        elif name is not None:
+            if name not in by_name:
+                raise RowError(f'{label} {name} not found')
+            row[id_key] = by_name[name]
@@ -1,13 +1,25 @@
-from flask import Blueprint, request, g
+import os
+import shutil
+import tempfile
+
+from flask import Blueprint, current_app, request, g
 from sqlalchemy import or_
-from sqlalchemy.orm import joinedload
-from .models import Product, StockOperation
+from .models import Product
 from . import db
-from .schemas import product_to_dict
-from .utils import role_required, Response, ValidationError, NotFoundError
+from .schemas import PRODUCT_FIELDS, load_options, parse_fields, product_to_dict
+from .statements import PRODUCT_DETAIL, PRODUCT_FOR_UPDATE
+from .utils import role_required, Response, ValidationError, NotFoundError, parse_ids
+from .jobs import JobRegistry
+from .product_import import ProductImporter, iter_rows
+from . import archive, cache, counters, product_bulk
+from .code_index import index as code_index
+from .transactions import transactional
 
 bp = Blueprint('products', __name__)
 
+# 商品导入后台任务（?async=1）
+import_jobs = JobRegistry('product_import', max_workers=1)
+
 @bp.route('', methods=['POST'])
 @role_required(['admin', 'stock_operator', 'purchaser'])
 def create_product():
@@ -36,10 +48,89 @@ def create_product():
     )
     
     db.session.add(p)
+    db.session.flush()
+    counters.Deltas().add(p.category_id, p.supplier_id, products=1, stock=p.stock or 0).apply()
     db.session.commit()
+    cache.bump('products')
+    code_index.discard(p.product_code)
     
     return Response.success({'product_id': p.product_id})
 
+@bp.route('/import', methods=['POST'])
+@role_required(['admin', 'stock_operator', 'purchaser'])
+def import_products():
+    """批量导入商品：multipart 的 file 字段，或直接把 CSV / NDJSON 作为请求体。"""
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = (upload.filename if upload else '') or ''
+    fmt = (request.args.get('format') or '').lower()
+    if not fmt:
+        content_type = (upload.mimetype if upload else request.mimetype) or ''
+        fmt = 'ndjson' if filename.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type else 'csv'
+    if fmt not in ('csv', 'ndjson'):
+        raise ValidationError('format must be csv or ndjson')
+
+    batch_size = min(max(request.args.get('batch_size', current_app.config.get('IMPORT_BATCH_SIZE', 1000), type=int), 1), 10000)
+    importer_args = (g.current_user.user_id, batch_size, current_app.config.get('PRODUCT_IMPORT_MAX_ERRORS', 1000))
+
+    if request.args.get('async') in ('1', 'true'):
+        # 请求结束后上传流就关了，先落到临时文件再交给后台任务
+        tmp = tempfile.NamedTemporaryFile(prefix='product-import-', suffix=f'.{fmt}', delete=False)
+        with tmp:
+            shutil.copyfileobj(stream, tmp, 1024 * 1024)
+        job = import_jobs.submit(current_app._get_current_object(), 'product_import', _run_import_job,
+                                 tmp.name, fmt, importer_args, params={'format': fmt, 'filename': filename})
+        return Response.success({'job_id': job.job_id, 'status': job.status})
+
+    importer = ProductImporter(*importer_args)
+    try:
+        return Response.success(importer.run(iter_rows(stream, fmt)))
+    finally:
+        cache.bump('products')
+        code_index.clear()
+
+@bp.route('/import/<string:job_id>', methods=['GET'])
+@role_required(['admin', 'stock_operator', 'purchaser'])
+def get_import_job(job_id):
+    job = import_jobs.get(current_app, job_id)
+    if not job:
+        raise NotFoundError('Import job not found')
+    return Response.success(job)
+
+def _run_import_job(job, path, fmt, importer_args):
+    size = os.path.getsize(path) or 1
+    try:
+        with open(path, 'rb') as f:
+            def progress(stats):
+                job.update(percent=round(min(f.tell() / size, 1.0) * 100, 1), **stats)
+
+            return ProductImporter(*importer_args).run(iter_rows(f, fmt), progress)
+    finally:
+        os.remove(path)
+        cache.bump('products')
+        code_index.clear()
+
+@bp.route('/bulk_update', methods=['POST'])
+@role_required(['admin', 'stock_operator'])
+def bulk_update_products():
+    """按条件批量改价/改属性，整批一条 UPDATE；dry_run 只返回命中数和预览。"""
+    data = request.json or {}
+    conditions = product_bulk.build_filter(data.get('filter'))
+    values = product_bulk.build_values(data.get('set'), data.get('rounding'))
+
+    if data.get('dry_run'):
+        matched, preview = product_bulk.preview(conditions, values)
+        return Response.success({'dry_run': True, 'matched': matched, 'preview': preview})
+
+    @transactional
+    def unit_of_work():
+        return product_bulk.apply(conditions, values)
+
+    updated = unit_of_work()
+    cache.bump('products')
+    code_index.clear()
+    return Response.success({'dry_run': False, 'updated': updated})
+
 @bp.route('', methods=['GET'])
 def list_products():
     page = int(request.args.get('page', 1))
@@ -50,8 +141,9 @@ def list_products():
     category_id = request.args.get('category_id')
     supplier_id = request.args.get('supplier_id')
     status = request.args.get('status')
+    fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
     
-    q = Product.query.options(joinedload(Product.category), joinedload(Product.supplier))
+    q = Product.query.options(*load_options(Product, PRODUCT_FIELDS, fields, ('category', 'supplier')))
 
     if keyword:
         q = q.filter(or_(
@@ -69,11 +161,49 @@ def list_products():
     total = q.count()
     items = q.offset((page-1)*size).limit(size).all()
     
-    return Response.pagination([product_to_dict(x) for x in items], total, page, size)
+    return Response.pagination([product_to_dict(x, fields) for x in items], total, page, size)
+
+@bp.route('/batch', methods=['GET'])
+def get_products_batch():
+    """按 ids 批量取商品，列表页一次补齐多行，按请求顺序返回"""
+    product_ids = parse_ids(request.args.get('ids'), cast=int, limit=500)
+    fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+    products = {
+        p.product_id: p
+        for p in Product.query.options(*load_options(Product, PRODUCT_FIELDS, fields, ('category', 'supplier')))
+        .filter(Product.product_id.in_(product_ids)).all()
+    }
+    return Response.success({
+        'items': [product_to_dict(products[pid], fields) for pid in product_ids if pid in products],
+        'missing': [pid for pid in product_ids if pid not in products],
+    })
+
+@bp.route('/by_code/<string:code>', methods=['GET'])
+def get_product_by_code(code):
+    """扫码：按商品编码取精简记录"""
+    record = code_index.resolve([code]).get(code)
+    if not record:
+        raise NotFoundError('Product not found')
+    return Response.success(record)
+
+@bp.route('/resolve_codes', methods=['POST'])
+def resolve_product_codes():
+    """整单扫码：一次解析一批编码，按请求顺序返回，重复编码只返回一次"""
+    codes = (request.json or {}).get('codes')
+    if not isinstance(codes, list) or not codes:
+        raise ValidationError('codes must be a non-empty list')
+    if len(codes) > 500:
+        raise ValidationError('At most 500 codes per request')
+    codes = list(dict.fromkeys(str(c).strip() for c in codes if c is not None and str(c).strip()))
+    found = code_index.resolve(codes)
+    return Response.success({
+        'items': [found[c] for c in codes if c in found],
+        'missing': [c for c in codes if c not in found],
+    })
 
 @bp.route('/<int:product_id>', methods=['GET'])
 def get_product(product_id):
-    product = Product.query.get(product_id)
+    product = db.session.execute(PRODUCT_DETAIL, {'product_id': product_id}).scalar_one_or_none()
     if not product:
         raise NotFoundError('Product not found')
     return Response.success(product_to_dict(product))
@@ -81,56 +211,73 @@ def get_product(product_id):
 @bp.route('/<int:product_id>', methods=['PUT'])
 @role_required(['admin', 'stock_operator'])
 def update_product(product_id):
-    product = Product.query.get(product_id)
-    if not product:
-        raise NotFoundError('Product not found')
-    
     data = request.json or {}
-    
-    # 不允许修改商品编码
-    if 'product_code' in data and data['product_code'] != product.product_code:
-        raise ValidationError('Product code cannot be modified')
-    
-    # 更新字段
-    if 'product_name' in data:
-        product.product_name = data['product_name']
-    if 'category_id' in data:
-        product.category_id = data['category_id']
-    if 'supplier_id' in data:
-        product.supplier_id = data['supplier_id']
-    if 'purchase_price' in data:
-        product.purchase_price = data['purchase_price']
-    if 'sale_price' in data:
-        product.sale_price = data['sale_price']
-    if 'min_stock' in data:
-        product.min_stock = data['min_stock']
-    if 'max_stock' in data:
-        product.max_stock = data['max_stock']
-    if 'storage_location' in data:
-        product.storage_location = data['storage_location']
-    if 'status' in data:
-        product.status = data['status']
-    
-    db.session.commit()
+
+    # 锁住商品行再读库存和分类/供应商，并发的出入库排在后面，计数不会按旧值转移
+    @transactional
+    def unit_of_work():
+        product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
+        if not product:
+            raise NotFoundError('Product not found')
+        old_refs = (product.category_id, product.supplier_id)
+
+        # 不允许修改商品编码
+        if 'product_code' in data and data['product_code'] != product.product_code:
+            raise ValidationError('Product code cannot be modified')
+
+        # 更新字段
+        if 'product_name' in data:
+            product.product_name = data['product_name']
+        if 'category_id' in data:
+            product.category_id = data['category_id']
+        if 'supplier_id' in data:
+            product.supplier_id = data['supplier_id']
+        if 'purchase_price' in data:
+            product.purchase_price = data['purchase_price']
+        if 'sale_price' in data:
+            product.sale_price = data['sale_price']
+        if 'min_stock' in data:
+            product.min_stock = data['min_stock']
+        if 'max_stock' in data:
+            product.max_stock = data['max_stock']
+        if 'storage_location' in data:
+            product.storage_location = data['storage_location']
+        if 'status' in data:
+            product.status = data['status']
+
+        counters.Deltas().move(old_refs, (product.category_id, product.supplier_id), product.stock).apply()
+        return product
+
+    product = unit_of_work()
+    cache.bump('products')
+    code_index.discard(product.product_code)
     return Response.success(product_to_dict(product))
 
 @bp.route('/<int:product_id>', methods=['DELETE'])
 @role_required(['admin'])
 def delete_product(product_id):
-    product = Product.query.get(product_id)
-    if not product:
-        raise NotFoundError('Product not found')
-    
-    # 检查是否存在库存流水，若存在则只能禁用
-    if StockOperation.query.filter_by(product_id=product_id).first():
-        # 禁用商品
-        product.status = 'inactive'
-        db.session.commit()
+    @transactional
+    def unit_of_work():
+        product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
+        if not product:
+            raise NotFoundError('Product not found')
+        code = product.product_code
+
+        # 检查是否存在库存流水，若存在则只能禁用
+        if archive.has_operations(product_id):
+            product.status = 'inactive'
+            return code, False
+
+        # 直接删除
+        counters.Deltas().add(product.category_id, product.supplier_id, products=-1, stock=-product.stock).apply()
+        db.session.delete(product)
+        return code, True
+
+    code, deleted = unit_of_work()
+    cache.bump('products')
+    code_index.discard(code)
+    if not deleted:
         return Response.success({'message': 'Product set to inactive instead of deleted (stock operations exist)', 'product_id': product_id})
-    
-    # 直接删除
-    db.session.delete(product)
-    db.session.commit()
     return Response.success({'product_id': product_id})
 
 @bp.route('/<int:product_id>/stock', methods=['GET'])
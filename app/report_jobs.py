@@ -0,0 +1,159 @@
+"""异步报表：耗时报表交给后台线程池跑，结果按参数哈希落盘，数据没变之前同样的请求直接复用。
+
+任务里直接调用对应报表接口的视图函数（在合成的请求上下文里，query string 就是提交的参数），
+校验和计算逻辑跟同步接口完全一样；流式导出（stock_as_of）也会收齐再解析。
+结果文件：<JOBS_DIR>/report_results/<哈希>.json，哈希由报表名、参数和当天日期算出
+（不传日期的报表默认取今天，跨天要重算）。文件里记着算的时候的数据版本
+（流水最大 op_id；商品、分类、供应商的行数和最近更新时间；每日汇总的行数、最近创建时间和期末合计），
+版本对不上就当作没有，重新算。
+"""
+import hashlib
+import inspect
+import json
+import os
+import threading
+from datetime import date, datetime
+
+from flask import Flask, current_app
+from sqlalchemy import func, select
+
+from . import db, metrics
+from .jobs import JobRegistry
+from .models import Category, InventorySummary, Product, StockOperation, Supplier
+from .utils import AppError, ValidationError
+
+# 报表名 -> (视图 endpoint, 可提交的角色)
+REPORTS = {
+    'stock_trend': ('reports.stock_trend', ('admin', 'stock_operator', 'finance', 'viewer')),
+    'inventory_report': ('reports.inventory_report', ('admin', 'stock_operator', 'finance', 'viewer')),
+    'valuation': ('reports.inventory_valuation', ('admin', 'stock_operator', 'finance', 'viewer')),
+    'stock_as_of': ('reports.stock_as_of', ('admin', 'stock_operator', 'finance', 'viewer')),
+    'reorder_suggestions': ('reports.reorder_suggestions', ('admin', 'stock_operator', 'purchaser', 'finance', 'viewer')),
+    'abc_xyz': ('reports.abc_xyz_report', ('admin', 'stock_operator', 'purchaser', 'finance', 'viewer')),
+}
+
+registry = JobRegistry('reports', max_workers=2)
+
+# 本进程里正在算的：结果键 -> job_id，同样的请求不重复提交
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def normalize_params(name: str, params) -> dict:
+    if name not in REPORTS:
+        raise ValidationError(f"Unknown report; allowed: {', '.join(REPORTS)}")
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise ValidationError('params must be an object')
+    params = {str(k): str(v) for k, v in params.items() if v is not None}
+    if name == 'stock_as_of':
+        # 结果要存成 JSON，CSV 导出请直接调同步接口
+        if params.get('format', 'json').lower() != 'json':
+            raise ValidationError('stock_as_of jobs only support format=json')
+        params.pop('format', None)
+    return params
+
+
+def result_key(name: str, params: dict, today: date) -> str:
+    raw = json.dumps([name, params, today.isoformat()], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def data_version() -> list:
+    """报表依赖的数据有没有变：流水只追加；商品、分类、供应商改动都会刷新 updated_at；
+    每日汇总当天重跑时原地改期末库存和金额，所以连合计一起比。"""
+    max_op = db.session.execute(select(func.max(StockOperation.op_id))).scalar() or 0
+    version = [max_op]
+    for model, pk in ((Product, Product.product_id), (Category, Category.category_id), (Supplier, Supplier.supplier_id)):
+        count, updated = db.session.execute(select(func.count(pk), func.max(model.updated_at))).one()
+        version += [count, _iso(updated)]
+    count, created, closing, value = db.session.execute(select(
+        func.count(InventorySummary.summary_id), func.max(InventorySummary.created_at),
+        func.sum(InventorySummary.closing_stock), func.sum(InventorySummary.total_value),
+    )).one()
+    return version + [count, _iso(created), int(closing or 0), str(value or 0)]
+
+
+def _result_dir(app: Flask) -> str:
+    path = os.path.join(app.config.get('JOBS_DIR') or os.path.join(app.instance_path, 'jobs'), 'report_results')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_result(app: Flask, key: str, version: list):
+    try:
+        with open(os.path.join(_result_dir(app), f'{key}.json'), encoding='utf-8') as f:
+            saved = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if saved.get('data_version') != version:
+        return None
+    return saved
+
+
+def _save_result(app: Flask, key: str, payload: dict) -> None:
+    path = os.path.join(_result_dir(app), f'{key}.json')
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def run_report(app: Flask, name: str, params: dict):
+    """在合成的请求上下文里调用报表视图（跳过鉴权，提交时已经校验过角色），返回响应里的 data。"""
+    view = inspect.unwrap(app.view_functions[REPORTS[name][0]])
+    with app.test_request_context(f'/api/reports/{name}', query_string=params):
+        response = app.make_response(view())
+        body = response.get_data()
+    payload = json.loads(body)
+    if payload.get('code') != 0:
+        raise AppError(payload.get('message') or 'Report failed', payload.get('code', 400))
+    return payload['data']
+
+
+def submit(app: Flask, name: str, params: dict, refresh: bool = False) -> dict:
+    """提交一个报表任务，返回任务状态；有可用的缓存结果时任务直接是 succeeded。"""
+    today = date.today()
+    key = result_key(name, params, today)
+    version = data_version()
+    db.session.rollback()
+    if not refresh:
+        saved = load_result(app, key, version)
+        if saved is not None:
+            metrics.inc('report_jobs.cache_hit')
+            return registry.complete(app, name, saved['result'], params=params,
+                                     cached=True, computed_at=saved['computed_at']).to_dict()
+    with _inflight_lock:
+        running = registry.get(app, _inflight.get(key))
+        if running and running['status'] in ('queued', 'running'):
+            return running
+        metrics.inc('report_jobs.cache_miss')
+        job = registry.submit(app, name, _run_job, name, params, key, version, params=params)
+        _inflight[key] = job.job_id
+    return job.to_dict()
+
+
+def _run_job(job, name, params, key, version):
+    app = current_app._get_current_object()
+    try:
+        job.update(stage='computing')
+        result = run_report(app, name, params)
+        job.update(stage='saving')
+        _save_result(app, key, {
+            'report': name,
+            'params': params,
+            'data_version': version,
+            'computed_at': datetime.utcnow().isoformat(),
+            'result': result,
+        })
+        job.update(stage='done', cached=False)
+        return result
+    finally:
+        with _inflight_lock:
+            if _inflight.get(key) == job.job_id:
+                del _inflight[key]
@@ -1,13 +1,27 @@
-from flask import Blueprint, request
-from . import scheduler, db
-from datetime import date, datetime, timedelta
+import csv
+import io
+import json
+
+from flask import Blueprint, current_app, g, request, stream_with_context
+from sqlalchemy import Float, case, func, select
+from . import db
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 from typing import Optional
-from .models import InventorySummary, Product
-from .utils import Response, role_required
+from .admission import admission
+from .cache import TTLCache
+from .compression import compress
+from .models import Category, InventorySummary, Order, Product, StockOperation, StockOperationArchive, Supplier
+from .utils import ForbiddenError, NotFoundError, Response, role_required, ValidationError
+from . import archive, rollup, valuation
 
 bp = Blueprint('reports', __name__)
 
+# 首页概览：商品、库存、订单任一有写入就失效，多 worker 之间最多陈旧一个 TTL
+overview_cache = TTLCache('overview', ttl=5, maxsize=4, depends_on=('products', 'stock', 'orders'))
+
 @bp.route('/inventory_alerts', methods=['GET'])
+@compress(gzip=9, br=7, zstd=9)
 @role_required(['admin', 'stock_operator', 'purchaser', 'finance', 'viewer'])
 def get_inventory_alerts():
     """获取库存预警信息"""
@@ -78,76 +92,123 @@ def daily_summary():
     
     return Response.success({'items': items})
 
+def _rollup_days(start: date, end: date, product_id=None):
+    """小时汇总按天合计；没开或还没建好返回 None，调用方扫原始流水。"""
+    if not current_app.config.get('STOCK_ROLLUP_ENABLED', True):
+        return None
+    return rollup.daily_totals(start, end, product_id)
+
 @bp.route('/inventory_report', methods=['GET'])
+@admission('report')
+@compress(gzip=9, br=7, zstd=9)
 @role_required(['admin', 'stock_operator', 'finance', 'viewer'])
 def inventory_report():
-    """获取库存日报"""
-    target = request.args.get('date')
-    if target:
-        report_date = datetime.strptime(target, '%Y-%m-%d').date()
+    """获取库存日报 / 区间报表：按天和整段的出入库合计，可按分类或供应商分组，流水明细可选并分页"""
+    args = request.args
+    if args.get('start_date') or args.get('end_date'):
+        end = _parse_date(args.get('end_date'), 'end_date') if args.get('end_date') else date.today()
+        start = _parse_date(args.get('start_date'), 'start_date') if args.get('start_date') else end
+        include_operations = args.get('include') == 'operations'
     else:
-        report_date = date.today()
-    
-    from .models import StockOperation
-    
-    # 获取当日库存汇总
-    summary_rows = InventorySummary.query.filter_by(summary_date=report_date).all()
-    
-    # 获取当日库存操作记录
-    start_time = datetime.combine(report_date, datetime.min.time())
-    end_time = datetime.combine(report_date, datetime.max.time())
-    
-    stock_operations = StockOperation.query.filter(
-        StockOperation.created_at >= start_time,
-        StockOperation.created_at <= end_time
+        # 只传 date（或都不传）是原来的单日日报，默认带流水明细
+        start = end = _parse_date(args.get('date'), 'date') if args.get('date') else date.today()
+        include_operations = args.get('include', 'operations') == 'operations'
+    if start > end:
+        raise ValidationError('start_date must not be after end_date')
+    max_days = int(current_app.config.get('INVENTORY_REPORT_MAX_DAYS', 366))
+    if (end - start).days + 1 > max_days:
+        raise ValidationError(f'Date range must not exceed {max_days} days')
+    group_by = args.get('group_by')
+    if group_by and group_by not in rollup.GROUP_BY:
+        raise ValidationError(f"group_by must be one of: {', '.join(rollup.GROUP_BY)}")
+
+    # 出入库合计全部走聚合查询：有小时汇总读汇总，没有就在原始流水上 GROUP BY
+    days, groups = rollup.totals(start, end, group_by=group_by,
+                                 use_rollup=current_app.config.get('STOCK_ROLLUP_ENABLED', True))
+    total = {'in': 0, 'out': 0, 'adjust': 0, 'in_value': 0.0, 'out_value': 0.0, 'op_count': 0}
+    for day in days.values():
+        for key in total:
+            total[key] += day[key]
+
+    # 期末库存快照取区间最后一天
+    summary_rows = db.session.execute(
+        select(InventorySummary.product_id, InventorySummary.closing_stock).where(InventorySummary.summary_date == end)
     ).all()
-    
-    # 统计当日出入库数据
-    in_total = 0
-    out_total = 0
-    adjust_total = 0
-    
-    for op in stock_operations:
-        if op.op_type == 'in':
-            in_total += op.quantity
-        elif op.op_type == 'out':
-            out_total += op.quantity
-        else:
-            adjust_total += abs(op.quantity)
-    
-    # 构造响应数据
-    summary_items = []
-    for r in summary_rows:
-        summary_items.append({
-            'product_id': r.product_id,
-            'stock': r.closing_stock
-        })
-    
-    operation_items = []
-    for op in stock_operations:
-        operation_items.append({
-            'op_id': op.op_id,
-            'product_id': op.product_id,
-            'op_type': op.op_type,
-            'quantity': op.quantity,
-            'created_at': op.created_at.isoformat(),
-            'reason': op.reason,
-            'order_id': op.order_id,
-        })
-    
-    return Response.success({
-        'report_date': report_date.isoformat(),
+
+    data = {
+        'report_date': end.isoformat(),
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
         'summary': {
             'total_products': len(summary_rows),
-            'total_in': in_total,
-            'total_out': out_total,
-            'total_adjust': adjust_total
+            'total_in': total['in'],
+            'total_out': total['out'],
+            'total_adjust': total['adjust'],
+            'in_value': round(total['in_value'], 2),
+            'out_value': round(total['out_value'], 2),
+            'op_count': total['op_count'],
         },
-        'stock_summary': summary_items,
-        'stock_operations': operation_items
-    })
+        'daily': [
+            {'date': day.isoformat(), **_rounded(values)} for day, values in days.items()
+        ],
+        'stock_summary': [{'product_id': r.product_id, 'stock': r.closing_stock} for r in summary_rows],
+    }
+    if group_by:
+        data['group_by'] = group_by
+        data['groups'] = _group_rows(group_by, groups)
+    if include_operations:
+        data.update(_operation_page(start, end, int(args.get('page', 1)), int(args.get('size', 100))))
+    return Response.success(data)
+
+def _parse_date(value: str, name: str) -> date:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(f'{name} must be YYYY-MM-DD')
+
+def _rounded(values: dict) -> dict:
+    return {**values, 'in_value': round(values['in_value'], 2), 'out_value': round(values['out_value'], 2)}
+
+def _group_rows(group_by: str, groups: dict) -> list:
+    if group_by == 'category':
+        model, id_col, name_col = Category, Category.category_id, Category.category_name
+    else:
+        model, id_col, name_col = Supplier, Supplier.supplier_id, Supplier.supplier_name
+    names = dict(db.session.execute(select(id_col, name_col).where(id_col.in_([g for g in groups if g is not None]))).all())
+    key = f'{group_by}_id'
+    return [
+        {key: group_id, f'{group_by}_name': names.get(group_id), **_rounded(values)}
+        for group_id, values in sorted(groups.items(), key=lambda item: (item[0] is None, item[0] or 0))
+    ]
+
+def _operation_page(start: date, end: date, page: int, size: int) -> dict:
+    """区间内的流水明细，按时间分页；size 上限 1000。"""
+    page, size = max(page, 1), min(max(size, 1), 1000)
+    start_time = datetime.combine(start, datetime.min.time())
+    end_time = datetime.combine(end, datetime.max.time())
+    Ops = archive.source(start_time, end_time)
+    query = db.session.query(Ops).filter(Ops.created_at >= start_time, Ops.created_at <= end_time)
+    operations = query.order_by(Ops.created_at, Ops.op_id).offset((page - 1) * size).limit(size).all()
+    return {
+        'stock_operations': [
+            {
+                'op_id': op.op_id,
+                'product_id': op.product_id,
+                'op_type': op.op_type,
+                'quantity': op.quantity,
+                'created_at': op.created_at.isoformat(),
+                'reason': op.reason,
+                'order_id': op.order_id,
+            }
+            for op in operations
+        ],
+        'operations_total': query.order_by(None).count(),
+        'page': page,
+        'size': size,
+    }
 
 @bp.route('/stock_trend', methods=['GET'])
+@admission('report')
 @role_required(['admin', 'stock_operator', 'finance', 'viewer'])
 def stock_trend():
     """获取商品出入库趋势图数据"""
@@ -166,19 +227,51 @@ def stock_trend():
     start = datetime.strptime(start_date, '%Y-%m-%d').date()
     end = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    from .models import StockOperation
-    
-    # 构建查询
     start_dt = datetime.combine(start, datetime.min.time())
     end_dt = datetime.combine(end, datetime.max.time())
-    query = StockOperation.query.filter(
-        StockOperation.created_at >= start_dt,
-        StockOperation.created_at <= end_dt
+
+    # 开了列式缓存就在 memmap 上直接按天汇总，不经过数据库
+    movements = None
+    if current_app.config.get('LEDGER_CACHE_ENABLED'):
+        from . import ledger_cache
+
+        movements = ledger_cache.daily_movements(current_app, start_dt, end_dt, product_id)
+    if movements is not None:
+        trend_data = []
+        for offset, (in_qty, out_qty, adjust_qty) in enumerate(movements.tolist()):
+            date_str = (start + timedelta(days=offset)).strftime('%Y-%m-%d')
+            trend_data.append({'date': date_str, 'in': in_qty, 'out': out_qty, 'adjust': adjust_qty})
+        return Response.success({
+            'start_date': start_date,
+            'end_date': end_date,
+            'product_id': product_id,
+            'trend_data': trend_data
+        })
+
+    # 其次读小时汇总（水位之后的流水查库补上）
+    totals = _rollup_days(start, end, product_id)
+    if totals is not None:
+        trend_data = [
+            {'date': day.strftime('%Y-%m-%d'), 'in': t['in'], 'out': t['out'], 'adjust': t['adjust']}
+            for day, t in totals.items()
+        ]
+        return Response.success({
+            'start_date': start_date,
+            'end_date': end_date,
+            'product_id': product_id,
+            'trend_data': trend_data
+        })
+    
+    # 构建查询
+    Ops = archive.source(start_dt, end_dt)
+    query = db.session.query(Ops).filter(
+        Ops.created_at >= start_dt,
+        Ops.created_at <= end_dt
     )
     
     # 如果指定了商品ID，则过滤
     if product_id:
-        query = query.filter_by(product_id=product_id)
+        query = query.filter(Ops.product_id == product_id)
     
     # 执行查询
     operations = query.all()
@@ -219,6 +312,333 @@ def stock_trend():
         'trend_data': result
     })
 
+@bp.route('/valuation', methods=['GET'])
+@admission('report')
+@role_required(['admin', 'stock_operator', 'finance', 'viewer'])
+def inventory_valuation():
+    """库存估值（移动加权平均 / FIFO），按日末结存计算"""
+    target = request.args.get('date')
+    try:
+        as_of = datetime.strptime(target, '%Y-%m-%d').date() if target else date.today()
+    except ValueError:
+        raise ValidationError('date must be YYYY-MM-DD')
+    page = max(request.args.get('page', 1, type=int), 1)
+    size = min(max(request.args.get('size', 50, type=int), 1), 1000)
+    product_id = request.args.get('product_id', type=int)
+
+    states = valuation.compute(
+        as_of,
+        product_ids=[product_id] if product_id else None,
+        category_id=request.args.get('category_id', type=int),
+        supplier_id=request.args.get('supplier_id', type=int),
+        persist=False,
+    )
+
+    totals = {'products': 0, 'quantity': 0, 'avg_value': Decimal('0'), 'fifo_value': Decimal('0')}
+    held = []
+    for pid in sorted(states):
+        state = states[pid]
+        if state.quantity == 0:
+            continue
+        held.append(pid)
+        totals['products'] += 1
+        totals['quantity'] += state.quantity
+        totals['avg_value'] += state.avg_value
+        totals['fifo_value'] += state.fifo_value
+    totals['avg_value'] = float(totals['avg_value'])
+    totals['fifo_value'] = float(totals['fifo_value'])
+
+    page_ids = held[(page - 1) * size:page * size]
+    names = {
+        pid: (code, name) for pid, code, name in db.session.query(
+            Product.product_id, Product.product_code, Product.product_name
+        ).filter(Product.product_id.in_(page_ids))
+    } if page_ids else {}
+    items = []
+    for pid in page_ids:
+        code, name = names.get(pid, (None, None))
+        items.append(dict(states[pid].to_dict(), product_id=pid, product_code=code, product_name=name))
+
+    return Response.success({
+        'date': as_of.isoformat(),
+        'totals': totals,
+        'items': items,
+        'total': len(held),
+        'page': page,
+        'size': size,
+    })
+
+def _parse_ts(value: str) -> datetime:
+    """解析 ts：只给日期时取当天日末；带时区的换算成 UTC（流水时间按 UTC 存）。"""
+    try:
+        if len(value) == 10:
+            return datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), datetime.max.time())
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValidationError('ts must be an ISO date or datetime')
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def stock_as_of_query(ts: datetime, product_ids=None, category_id=None, supplier_id=None, status=None):
+    """每个商品在 ts 时刻的库存。
+
+    流水的 after_quantity 本身就是结存，所以只需按 (product_id, created_at) 索引找 ts 之前最后一条；
+    某商品在 ts 之前没有流水（例如流水已归档）时，退回 ts 之前最近一天的 InventorySummary 期末库存。
+    """
+    last_op = (
+        select(StockOperation.stock_after)
+        .where(StockOperation.product_id == Product.product_id, StockOperation.created_at <= ts)
+        .order_by(StockOperation.created_at.desc(), StockOperation.op_id.desc())
+        .limit(1)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+    if archive.boundary() is not None:
+        # 热表里 ts 之前没有流水的商品，再到归档表里找
+        archived_op = (
+            select(StockOperationArchive.stock_after)
+            .where(StockOperationArchive.product_id == Product.product_id, StockOperationArchive.created_at <= ts)
+            .order_by(StockOperationArchive.created_at.desc(), StockOperationArchive.op_id.desc())
+            .limit(1)
+            .correlate(Product)
+            .scalar_subquery()
+        )
+        last_op = func.coalesce(last_op, archived_op)
+    snapshot = (
+        select(InventorySummary.closing_stock)
+        .where(InventorySummary.product_id == Product.product_id, InventorySummary.summary_date < ts.date())
+        .order_by(InventorySummary.summary_date.desc())
+        .limit(1)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+    q = select(Product.product_id, Product.product_code, Product.product_name,
+               last_op.label('ledger_stock'), snapshot.label('snapshot_stock'))
+    if product_ids:
+        q = q.where(Product.product_id.in_(product_ids))
+    if category_id is not None:
+        q = q.where(Product.category_id == category_id)
+    if supplier_id is not None:
+        q = q.where(Product.supplier_id == supplier_id)
+    if status:
+        q = q.where(Product.status == status)
+    return q.order_by(Product.product_id)
+
+@bp.route('/stock_as_of', methods=['GET'])
+@admission('report')
+@compress(gzip=5, br=4, zstd=3)
+@role_required(['admin', 'stock_operator', 'finance', 'viewer'])
+def stock_as_of():
+    """某一时刻全部（或部分）商品的库存，流式输出 JSON 或 CSV"""
+    raw_ts = (request.args.get('ts') or '').strip()
+    if not raw_ts:
+        raise ValidationError('ts is required')
+    ts = _parse_ts(raw_ts)
+    fmt = (request.args.get('format') or 'json').lower()
+    if fmt not in ('json', 'csv'):
+        raise ValidationError('format must be json or csv')
+    product_ids = None
+    if request.args.get('product_ids'):
+        try:
+            product_ids = [int(x) for x in request.args['product_ids'].split(',') if x.strip()]
+        except ValueError:
+            raise ValidationError('product_ids must be comma separated integers')
+
+    stmt = stock_as_of_query(
+        ts, product_ids,
+        category_id=request.args.get('category_id', type=int),
+        supplier_id=request.args.get('supplier_id', type=int),
+        status=request.args.get('status'),
+    ).execution_options(yield_per=2000)
+
+    def rows():
+        for pid, code, name, ledger_stock, snapshot_stock in db.session.execute(stmt):
+            if ledger_stock is not None:
+                yield pid, code, name, ledger_stock, 'ledger'
+            elif snapshot_stock is not None:
+                yield pid, code, name, snapshot_stock, 'snapshot'
+            else:
+                yield pid, code, name, 0, 'none'
+
+    def generate_json():
+        yield '{"code": 0, "message": "success", "data": {"ts": %s, "items": [' % json.dumps(ts.isoformat())
+        for i, (pid, code, name, stock, source) in enumerate(rows()):
+            item = {'product_id': pid, 'product_code': code, 'product_name': name, 'stock': stock, 'source': source}
+            yield (',' if i else '') + json.dumps(item, ensure_ascii=False)
+        yield ']}}'
+
+    def generate_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(['product_id', 'product_code', 'product_name', 'stock', 'source'])
+        for i, row in enumerate(rows(), start=1):
+            writer.writerow(row)
+            if i % 500 == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    if fmt == 'csv':
+        return current_app.response_class(stream_with_context(generate_csv()), mimetype='text/csv')
+    return current_app.response_class(stream_with_context(generate_json()), mimetype='application/json')
+
+def _reorder_params(args, config):
+    """补货建议参数：请求里没给就用配置默认值，并做范围校验。"""
+    try:
+        params = {
+            'days': int(args.get('days', config.get('REORDER_LOOKBACK_DAYS', 56))),
+            'lead_time_days': int(args.get('lead_time_days', config.get('REORDER_LEAD_TIME_DAYS', 7))),
+            'review_days': int(args.get('review_days', config.get('REORDER_REVIEW_DAYS', 7))),
+            'service_level': float(args.get('service_level', config.get('REORDER_SERVICE_LEVEL', 0.95))),
+        }
+    except ValueError:
+        raise ValidationError('days, lead_time_days, review_days must be integers and service_level a number')
+    if not 7 <= params['days'] <= 365:
+        raise ValidationError('days must be between 7 and 365')
+    if not 1 <= params['lead_time_days'] <= 180 or not 0 <= params['review_days'] <= 180:
+        raise ValidationError('lead_time_days must be 1-180 and review_days 0-180')
+    if not 0.5 <= params['service_level'] < 1:
+        raise ValidationError('service_level must be in [0.5, 1)')
+    return params
+
+@bp.route('/reorder_suggestions', methods=['GET'])
+@admission('report')
+@role_required(['admin', 'stock_operator', 'purchaser', 'finance', 'viewer'])
+def reorder_suggestions():
+    """按供应商分组的补货建议（需求预测 + 安全库存）"""
+    from . import forecasting
+
+    params = _reorder_params(request.args, current_app.config)
+    # 默认按昨天（UTC）为止的完整天数预测，与夜间任务一致
+    as_of = datetime.utcnow().date() - timedelta(days=1)
+    include_all = request.args.get('all') in ('1', 'true')
+    if not include_all and request.args.get('refresh') not in ('1', 'true'):
+        cached = forecasting.load_snapshot(current_app, params, as_of)
+        if cached is not None:
+            return Response.success(cached)
+    return Response.success(forecasting.suggestions(
+        as_of, params['days'], params['lead_time_days'], params['review_days'], params['service_level'],
+        include_all=include_all,
+    ))
+
+@bp.route('/abc_xyz', methods=['GET'])
+@admission('report')
+@role_required(['admin', 'stock_operator', 'purchaser', 'finance', 'viewer'])
+def abc_xyz_report():
+    """ABC（销售额贡献）/ XYZ（需求波动）分类"""
+    from . import abc_xyz
+
+    try:
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else date.today()
+        start = (datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date')
+                 else end - timedelta(days=364))
+    except ValueError:
+        raise ValidationError('start_date and end_date must be YYYY-MM-DD')
+    if start > end or (end - start).days > 731:
+        raise ValidationError('Date range must be positive and at most 2 years')
+    bucket = request.args.get('bucket', 'week')
+    if bucket not in abc_xyz.BUCKET_DAYS:
+        raise ValidationError('bucket must be day, week or month')
+    try:
+        a, b = float(request.args.get('a', 0.8)), float(request.args.get('b', 0.95))
+        x, y = float(request.args.get('x', 0.5)), float(request.args.get('y', 1.0))
+    except ValueError:
+        raise ValidationError('Thresholds must be numbers')
+    if not 0 < a < b <= 1 or not 0 < x < y:
+        raise ValidationError('Thresholds must satisfy 0 < a < b <= 1 and 0 < x < y')
+    cls = (request.args.get('class') or '').upper() or None
+    if cls and cls not in abc_xyz.CLASSES:
+        raise ValidationError('class must be one of ' + ', '.join(abc_xyz.CLASSES))
+    page = max(request.args.get('page', 1, type=int), 1)
+    size = min(max(request.args.get('size', 50, type=int), 1), 1000)
+
+    key = (start, end, bucket, a, b, x, y)
+    result = abc_xyz.results.get_or_compute(key, lambda: abc_xyz.compute(start, end, bucket, a, b, x, y))
+    items, total = abc_xyz.page(result, cls, page, size)
+    data = {k: v for k, v in result.items() if not k.startswith('_')}
+    data.update(items=items, total=total, page=page, size=size)
+    return Response.success(data)
+
+def compute_overview(today: date) -> dict:
+    """三条聚合查询：商品按状态、当日流水按类型、当日订单按类型。"""
+    conn = db.session.connection()
+    products = conn.execute(
+        select(Product.status, func.count(Product.product_id),
+               func.sum(Product.stock * Product.purchase_price, type_=Float),
+               func.sum(case((Product.stock <= Product.min_stock, 1), else_=0)),
+               func.sum(case((Product.stock >= Product.max_stock, 1), else_=0)))
+        .group_by(Product.status)
+    ).all()
+
+    start = datetime.combine(today, datetime.min.time())
+    end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    # 调整数量有正有负，和日报一样按绝对值累计
+    ops = dict(conn.execute(
+        select(StockOperation.op_type,
+               func.sum(case((StockOperation.op_type == 'adjust', func.abs(StockOperation.quantity)),
+                             else_=StockOperation.quantity)))
+        .where(StockOperation.created_at >= start, StockOperation.created_at < end)
+        .group_by(StockOperation.op_type)
+    ).all())
+    orders = conn.execute(
+        select(Order.order_type, func.count(Order.order_id), func.sum(Order.total_amount, type_=Float))
+        .where(Order.created_at >= start, Order.created_at < end)
+        .group_by(Order.order_type)
+    ).all()
+
+    return {
+        'date': today.isoformat(),
+        'total_products': sum(r[1] for r in products),
+        'stock_value': round(sum(r[2] or 0 for r in products), 2),
+        'products_by_status': {r[0]: r[1] for r in products},
+        'today_stock': {
+            'in': int(ops.get('in') or 0),
+            'out': int(ops.get('out') or 0),
+            'adjust': int(ops.get('adjust') or 0),
+        },
+        'today_orders': {
+            r[0]: {'count': r[1], 'amount': round(r[2] or 0, 2)} for r in orders
+        },
+        'alerts': {
+            'low_stock': int(sum(r[3] or 0 for r in products)),
+            'high_stock': int(sum(r[4] or 0 for r in products)),
+        },
+        'generated_at': datetime.utcnow().isoformat(),
+    }
+
+@bp.route('/jobs', methods=['POST'])
+@role_required(['admin', 'stock_operator', 'purchaser', 'finance', 'viewer'])
+def submit_report_job():
+    """异步跑报表：{"report": "stock_trend", "params": {...}, "refresh": false}，返回任务 ID 和状态"""
+    from . import report_jobs
+
+    body = request.get_json(silent=True) or {}
+    name = body.get('report')
+    params = report_jobs.normalize_params(name, body.get('params'))
+    if g.current_user.role not in report_jobs.REPORTS[name][1]:
+        raise ForbiddenError()
+    job = report_jobs.submit(current_app._get_current_object(), name, params, refresh=bool(body.get('refresh')))
+    return Response.success(job)
+
+@bp.route('/jobs/<string:job_id>', methods=['GET'])
+@role_required(['admin', 'stock_operator', 'purchaser', 'finance', 'viewer'])
+def get_report_job(job_id):
+    from . import report_jobs
+
+    job = report_jobs.registry.get(current_app, job_id)
+    if not job:
+        raise NotFoundError('Report job not found')
+    return Response.success(job)
+
+@bp.route('/overview', methods=['GET'])
+@role_required(['admin', 'stock_operator', 'purchaser', 'finance', 'viewer'])
+def overview():
+    """首页概览：商品数、库存金额、当日出入库和订单、预警数"""
+    today = date.today()
+    return Response.success(overview_cache.get_or_compute(today, lambda: compute_overview(today)))
+
 def refresh_inventory_summary_python(target_date: Optional[date] = None):
     """刷新每日库存汇总"""
     if target_date is None:
@@ -260,7 +680,7 @@ def generate_inventory_alerts():
     print(f"Inventory alerts generated at {datetime.now()}")
     return True
 
-def schedule_jobs(app):
+def schedule_jobs(app, scheduler):
     """配置定时任务"""
     def _refresh_inventory_summary():
         with app.app_context():
@@ -270,6 +690,48 @@ def schedule_jobs(app):
         with app.app_context():
             generate_inventory_alerts()
 
+    def _valuation_checkpoint():
+        with app.app_context():
+            # 昨天（UTC）的流水已经不会再变，落检查点
+            valuation.compute(datetime.utcnow().date() - timedelta(days=1), persist=True)
+
+    def _archive_stock_operations():
+        with app.app_context():
+            archive.run(app.config.get('STOCK_OPS_RETENTION_MONTHS', 12), app.config.get('STOCK_OPS_ARCHIVE_BATCH', 5000))
+
+    def _sync_ledger_cache():
+        from . import ledger_cache
+
+        with app.app_context():
+            ledger_cache.sync(app)
+
+    def _sync_stock_rollup():
+        with app.app_context():
+            rollup.sync(app.config.get('STOCK_ROLLUP_BATCH', 5000), app.config.get('STOCK_ROLLUP_LAG_SECONDS', 300))
+
+    def _verify_stock_rollup():
+        with app.app_context():
+            # 昨天（UTC）的汇总对账一次，不一致就按原始流水重建
+            yesterday = datetime.utcnow().date() - timedelta(days=1)
+            rollup.verify(yesterday, yesterday, repair=True)
+
+    def _repair_counters():
+        from .counters import repair
+
+        with app.app_context():
+            repair()
+
+    def _reorder_suggestions():
+        from . import forecasting
+
+        with app.app_context():
+            params = _reorder_params({}, app.config)
+            result = forecasting.suggestions(
+                datetime.utcnow().date() - timedelta(days=1), params['days'], params['lead_time_days'],
+                params['review_days'], params['service_level'],
+            )
+            forecasting.save_snapshot(app, result)
+
     # 每天00:00生成库存汇总
     scheduler.add_job(
         func=_refresh_inventory_summary,
@@ -290,4 +752,79 @@ def schedule_jobs(app):
         replace_existing=True
     )
     
-    print("Scheduled jobs added: daily_inventory_summary, hourly_inventory_alerts")
+    # 每天00:30生成估值检查点
+    scheduler.add_job(
+        func=_valuation_checkpoint,
+        trigger='cron',
+        hour=0,
+        minute=30,
+        id='daily_valuation_checkpoint',
+        replace_existing=True
+    )
+    
+    # 每天01:00生成补货建议
+    scheduler.add_job(
+        func=_reorder_suggestions,
+        trigger='cron',
+        hour=1,
+        minute=0,
+        id='daily_reorder_suggestions',
+        replace_existing=True
+    )
+    
+    # 每天03:00按商品表校正分类/供应商计数
+    scheduler.add_job(
+        func=_repair_counters,
+        trigger='cron',
+        hour=3,
+        minute=0,
+        id='daily_counter_repair',
+        replace_existing=True
+    )
+    
+    # 每月1日02:00归档超过保留期的库存流水
+    scheduler.add_job(
+        func=_archive_stock_operations,
+        trigger='cron',
+        day=1,
+        hour=2,
+        minute=0,
+        id='monthly_stock_ops_archive',
+        replace_existing=True
+    )
+    
+    # 列式流水缓存：按水位追加新流水
+    if app.config.get('LEDGER_CACHE_ENABLED'):
+        scheduler.add_job(
+            func=_sync_ledger_cache,
+            trigger='interval',
+            seconds=app.config.get('LEDGER_CACHE_SYNC_SECONDS', 60),
+            id='ledger_cache_sync',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+    
+    # 库存流水小时汇总：按水位增量累加，每天03:30对账前一天
+    if app.config.get('STOCK_ROLLUP_ENABLED', True):
+        scheduler.add_job(
+            func=_sync_stock_rollup,
+            trigger='interval',
+            seconds=app.config.get('STOCK_ROLLUP_SYNC_SECONDS', 60),
+            id='stock_rollup_sync',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        scheduler.add_job(
+            func=_verify_stock_rollup,
+            trigger='cron',
+            hour=3,
+            minute=30,
+            id='daily_stock_rollup_verify',
+            replace_existing=True
+        )
+    
+    print("Scheduled jobs added: daily_inventory_summary, hourly_inventory_alerts, "
+          "daily_valuation_checkpoint, daily_reorder_suggestions, daily_counter_repair, "
+          "monthly_stock_ops_archive")
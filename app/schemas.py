@@ -1,6 +1,134 @@
 # simple marshalling helpers (you can replace with Marshmallow later)
+from sqlalchemy.orm import joinedload, load_only
 
-def category_to_dict(category, stats=None):
+from .utils import ValidationError
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _money(value):
+    return float(value) if value is not None else None
+
+
+# 各资源可输出的字段：字段名 -> (要加载的列, 要 join 的关联, 取值函数)
+# 关联写成 (关联名, 关联表上要加载的列)；fields= 只能从这里面挑
+CATEGORY_FIELDS = {
+    'category_id': (('category_id',), None, lambda c: c.category_id),
+    'category_name': (('category_name',), None, lambda c: c.category_name),
+    'description': (('description',), None, lambda c: c.description),
+    'created_at': (('created_at',), None, lambda c: _iso(getattr(c, 'created_at', None))),
+    'updated_at': (('updated_at',), None, lambda c: _iso(getattr(c, 'updated_at', None))),
+    'product_count': (('product_count',), None, lambda c: c.product_count or 0),
+    'total_stock': (('total_stock',), None, lambda c: c.total_stock or 0),
+}
+
+SUPPLIER_FIELDS = {
+    'supplier_id': (('supplier_id',), None, lambda s: s.supplier_id),
+    'supplier_name': (('supplier_name',), None, lambda s: s.supplier_name),
+    'contact_person': (('contact_person',), None, lambda s: getattr(s, 'contact_person', None)),
+    'phone': (('phone',), None, lambda s: getattr(s, 'phone', None)),
+    'email': (('email',), None, lambda s: getattr(s, 'email', None)),
+    'address': (('address',), None, lambda s: getattr(s, 'address', None)),
+    'created_at': (('created_at',), None, lambda s: _iso(getattr(s, 'created_at', None))),
+    'updated_at': (('updated_at',), None, lambda s: _iso(getattr(s, 'updated_at', None))),
+    'product_count': (('product_count',), None, lambda s: s.product_count or 0),
+    'total_stock': (('total_stock',), None, lambda s: s.total_stock or 0),
+}
+
+PRODUCT_FIELDS = {
+    'product_id': (('product_id',), None, lambda p: p.product_id),
+    'product_code': (('product_code',), None, lambda p: p.product_code),
+    'product_name': (('product_name',), None, lambda p: p.product_name),
+    'category_id': (('category_id',), None, lambda p: p.category_id),
+    'category_name': (('category_id',), ('category', ('category_name',)),
+                      lambda p: p.category.category_name if getattr(p, 'category', None) else None),
+    'supplier_id': (('supplier_id',), None, lambda p: p.supplier_id),
+    'supplier_name': (('supplier_id',), ('supplier', ('supplier_name',)),
+                      lambda p: p.supplier.supplier_name if getattr(p, 'supplier', None) else None),
+    'purchase_price': (('purchase_price',), None, lambda p: float(p.purchase_price)),
+    'sale_price': (('sale_price',), None, lambda p: float(p.sale_price)),
+    'stock': (('stock',), None, lambda p: p.stock),
+    'min_stock': (('min_stock',), None, lambda p: p.min_stock),
+    'max_stock': (('max_stock',), None, lambda p: p.max_stock),
+    'status': (('status',), None, lambda p: p.status),
+    'storage_location': (('storage_location',), None, lambda p: p.storage_location),
+    'created_by': (('created_by',), None, lambda p: p.created_by),
+    'created_at': (('created_at',), None, lambda p: _iso(p.created_at)),
+    'updated_at': (('updated_at',), None, lambda p: _iso(p.updated_at)),
+}
+
+STOCK_OPERATION_FIELDS = {
+    'op_id': (('op_id',), None, lambda op: op.op_id),
+    'product_id': (('product_id',), None, lambda op: op.product_id),
+    'product_code': (('product_id',), ('product', ('product_code',)),
+                     lambda op: op.product.product_code if getattr(op, 'product', None) else None),
+    'product_name': (('product_id',), ('product', ('product_name',)),
+                     lambda op: op.product.product_name if getattr(op, 'product', None) else None),
+    'op_type': (('op_type',), None, lambda op: op.op_type),
+    'quantity': (('quantity',), None, lambda op: op.quantity),
+    'stock_before': (('stock_before',), None, lambda op: op.stock_before),
+    'stock_after': (('stock_after',), None, lambda op: op.stock_after),
+    'order_id': (('order_id',), None, lambda op: op.order_id),
+    'unit_price': (('unit_price',), None, lambda op: _money(op.unit_price)),
+    'total_price': (('total_price',), None, lambda op: _money(op.total_price)),
+    'operation_date': (('operation_date',), None, lambda op: _iso(op.operation_date)),
+    'operator_action': (('operator_action',), None, lambda op: op.operator_action),
+    'reason': (('reason',), None, lambda op: op.reason),
+    'notes': (('notes',), None, lambda op: op.notes),
+    'operator_id': (('operator_id',), None, lambda op: op.operator_id),
+    'created_at': (('created_at',), None, lambda op: _iso(op.created_at)),
+}
+
+ORDER_FIELDS = {
+    'order_id': (('order_id',), None, lambda o: o.order_id),
+    'order_type': (('order_type',), None, lambda o: o.order_type),
+    'total_amount': (('total_amount',), None, lambda o: float(o.total_amount)),
+    'status': (('status',), None, lambda o: o.status),
+    'created_at': (('created_at',), None, lambda o: _iso(o.created_at)),
+    'updated_at': (('updated_at',), None, lambda o: _iso(o.updated_at)),
+}
+
+
+def parse_fields(raw, spec):
+    """解析 fields=a,b,c；没传返回 None（输出全部字段），有不认识的字段报错。"""
+    if not raw:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in names if f not in spec]
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(spec)}")
+    return names or None
+
+
+def load_options(model, spec, names, default_joins=()):
+    """按要输出的字段生成查询选项：只加载用到的列，只 join 用到的关联。
+
+    names 为 None 时不限制列，只 join default_joins 里的关联（保持原来的查询）。
+    """
+    if names is None:
+        return [joinedload(getattr(model, rel)) for rel in default_joins]
+    columns, joins = set(), {}
+    for name in names:
+        cols, join, _ = spec[name]
+        columns.update(cols)
+        if join:
+            joins.setdefault(join[0], set()).update(join[1])
+    options = [load_only(*(getattr(model, c) for c in sorted(columns)))]
+    for rel, cols in joins.items():
+        target = getattr(model, rel).property.mapper.class_
+        options.append(joinedload(getattr(model, rel)).load_only(*(getattr(target, c) for c in sorted(cols))))
+    return options
+
+
+def dump(obj, spec, names=None):
+    return {name: spec[name][2](obj) for name in (names or spec)}
+
+
+def category_to_dict(category, stats=None, fields=None):
+    if fields:
+        return dump(category, CATEGORY_FIELDS, fields)
     payload = {
         'category_id': category.category_id,
         'category_name': category.category_name,
@@ -12,7 +140,9 @@ def category_to_dict(category, stats=None):
         payload.update(stats)
     return payload
 
-def supplier_to_dict(supplier, stats=None):
+def supplier_to_dict(supplier, stats=None, fields=None):
+    if fields:
+        return dump(supplier, SUPPLIER_FIELDS, fields)
     payload = {
         'supplier_id': supplier.supplier_id,
         'supplier_name': supplier.supplier_name,
@@ -27,57 +157,14 @@ def supplier_to_dict(supplier, stats=None):
         payload.update(stats)
     return payload
 
-def product_to_dict(p):
-    return {
-        'product_id': p.product_id,
-        'product_code': p.product_code,
-        'product_name': p.product_name,
-        'category_id': p.category_id,
-        'category_name': p.category.category_name if getattr(p, 'category', None) else None,
-        'supplier_id': p.supplier_id,
-        'supplier_name': p.supplier.supplier_name if getattr(p, 'supplier', None) else None,
-        'purchase_price': float(p.purchase_price),
-        'sale_price': float(p.sale_price),
-        'stock': p.stock,
-        'min_stock': p.min_stock,
-        'max_stock': p.max_stock,
-        'status': p.status,
-        'storage_location': p.storage_location,
-        'created_by': p.created_by,
-        'created_at': p.created_at.isoformat() if p.created_at else None,
-        'updated_at': p.updated_at.isoformat() if p.updated_at else None
-    }
+def product_to_dict(p, fields=None):
+    return dump(p, PRODUCT_FIELDS, fields)
 
-def stock_operation_to_dict(op):
-    return {
-        'op_id': op.op_id,
-        'product_id': op.product_id,
-        'product_code': op.product.product_code if getattr(op, 'product', None) else None,
-        'product_name': op.product.product_name if getattr(op, 'product', None) else None,
-        'op_type': op.op_type,
-        'quantity': op.quantity,
-        'stock_before': op.stock_before,
-        'stock_after': op.stock_after,
-        'order_id': op.order_id,
-        'unit_price': float(op.unit_price) if op.unit_price is not None else None,
-        'total_price': float(op.total_price) if op.total_price is not None else None,
-        'operation_date': op.operation_date.isoformat() if op.operation_date else None,
-        'operator_action': op.operator_action,
-        'reason': op.reason,
-        'notes': op.notes,
-        'operator_id': op.operator_id,
-        'created_at': op.created_at.isoformat() if op.created_at else None
-    }
+def stock_operation_to_dict(op, fields=None):
+    return dump(op, STOCK_OPERATION_FIELDS, fields)
 
-def order_to_dict(order):
-    return {
-        'order_id': order.order_id,
-        'order_type': order.order_type,
-        'total_amount': float(order.total_amount),
-        'status': order.status,
-        'created_at': order.created_at.isoformat() if order.created_at else None,
-        'updated_at': order.updated_at.isoformat() if order.updated_at else None
-    }
+def order_to_dict(order, fields=None):
+    return dump(order, ORDER_FIELDS, fields)
 
 def inventory_summary_to_dict(summary):
     return {
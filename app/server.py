@@ -0,0 +1,87 @@
+"""生产环境 WSGI 入口：master 预加载应用，fork 出 worker 处理请求。
+
+    python manage.py serve --workers 4 --threads 8 --bind 0.0.0.0:5001
+
+平滑重载：``kill -HUP <master pid>`` 会按新配置逐个替换 worker，
+正在处理的请求会跑完再退出；升级代码用 ``USR2`` + ``QUIT`` 换 master。
+"""
+import argparse
+import multiprocessing
+import os
+
+from flask import Flask
+
+from . import db, start_scheduler
+from .startup import prewarm
+
+
+def _default_workers() -> int:
+    return int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='manage.py serve', description='Run the production WSGI server')
+    parser.add_argument('--bind', default=os.getenv('SERVER_BIND', '0.0.0.0:5001'))
+    parser.add_argument('--workers', type=int, default=_default_workers())
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVER_THREADS', '4')))
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVER_TIMEOUT', '30')))
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30')))
+    parser.add_argument('--max-requests', type=int, default=int(os.getenv('SERVER_MAX_REQUESTS', '0')))
+    parser.add_argument('--pidfile', default=os.getenv('SERVER_PIDFILE'))
+    parser.add_argument('--no-scheduler', action='store_true', help='do not run scheduled jobs in the master')
+    return parser
+
+
+def dispose_engines(app: Flask, close: bool = True) -> None:
+    """丢掉连接池。worker 里 close=False：继承来的 socket 归 master，不能替它关。"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def serve(app: Flask, argv=None) -> None:
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as exc:
+        raise SystemExit('gunicorn is required for "manage.py serve": pip install gunicorn') from exc
+
+    args = build_parser().parse_args(argv)
+    run_scheduler = not args.no_scheduler and app.config.get('SCHEDULER_ENABLED', True)
+
+    def when_ready(_server):
+        # 定时任务只在 master 里跑一份，fork 出来的 worker 不会继承调度线程
+        if run_scheduler:
+            start_scheduler(app)
+
+    def post_fork(_server, _worker):
+        dispose_engines(app, close=False)
+        if app.config.get('APP_PREWARM'):
+            prewarm(app)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+        'pidfile': args.pidfile,
+        'preload_app': True,
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+    }
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    # master 里预加载时可能已经建过连接，fork 前先清掉
+    dispose_engines(app)
+    _Application().run()
@@ -0,0 +1,122 @@
+"""冷启动分析与预热。
+
+    python manage.py startup_report --top 20
+
+在干净的子进程里用 ``-X importtime`` 加载应用并打一次请求，输出各阶段耗时
+和最慢的导入模块；``prewarm`` 则在开始接流量前把连接池和热点 SQL 准备好。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from flask import Flask
+from sqlalchemy import select
+from sqlalchemy.orm import configure_mappers
+
+from . import db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程里执行：分阶段计时，最后一行输出 JSON
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+{config_import}
+app = create_app({config_arg}, with_scheduler=False)
+t2 = time.perf_counter()
+if {prewarm}:
+    from app.startup import prewarm
+    prewarm(app)
+t3 = time.perf_counter()
+status = app.test_client().get({path!r}).status_code
+t4 = time.perf_counter()
+print(json.dumps({{'import': t1 - t0, 'create_app': t2 - t1, 'prewarm': t3 - t2,
+                  'first_request': t4 - t3, 'total': t4 - t0, 'status': status}}))
+"""
+
+
+def measure_cold_start(path='/api/categories', use_config=True, prewarm=False, importtime=False, env=None):
+    """起一个新解释器测一次冷启动，返回 (阶段耗时, importtime 原始输出)。"""
+    script = PROBE.format(
+        config_import='from app.config import Config' if use_config else '',
+        config_arg='Config' if use_config else 'None',
+        prewarm=bool(prewarm),
+        path=path,
+    )
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    proc = subprocess.run(cmd + ['-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'probe failed')
+    phases = json.loads(proc.stdout.strip().splitlines()[-1])
+    return phases, proc.stderr
+
+
+def parse_importtime(output):
+    """解析 ``-X importtime`` 输出，返回 [(模块, 自身微秒, 累计微秒, 层级)]。"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def startup_report(argv=None):
+    parser = argparse.ArgumentParser(prog='manage.py startup_report', description='Break down application cold start')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--path', default='/api/categories', help='route used for the first request')
+    parser.add_argument('--no-config', action='store_true', help='call create_app() without app.config.Config')
+    parser.add_argument('--prewarm', action='store_true')
+    args = parser.parse_args(argv)
+
+    phases, raw = measure_cold_start(args.path, not args.no_config, args.prewarm, importtime=True)
+    rows = parse_importtime(raw)
+
+    print('== phases ==')
+    for key in ('import', 'create_app', 'prewarm', 'first_request', 'total'):
+        print(f'{key:<14} {phases[key] * 1000:>9.1f} ms')
+    print(f"first request status: {phases['status']}")
+
+    # 前两层（app 自己和它直接拉进来的依赖）按累计耗时排序，看清楚钱花在哪个依赖上
+    top_level = {}
+    for name, _self_us, cumulative_us, depth in rows:
+        if depth <= 1:
+            top_level[name] = max(top_level.get(name, 0), cumulative_us)
+    print(f'\n== top {args.top} packages by cumulative import time ==')
+    for name, us in sorted(top_level.items(), key=lambda x: -x[1])[:args.top]:
+        print(f'{us / 1000:>9.1f} ms  {name}')
+
+    print(f'\n== top {args.top} modules by self time ==')
+    for name, self_us, _cum, _depth in sorted(rows, key=lambda x: -x[1])[:args.top]:
+        print(f'{self_us / 1000:>9.1f} ms  {name}')
+
+
+def prewarm(app: Flask, connections=None) -> None:
+    """预热：配置 ORM mapper、建满连接池、把热点查询的 SQL 编译进缓存。"""
+    from .models import Category, Product, StockOperation, User
+
+    with app.app_context():
+        configure_mappers()
+
+        engine = db.engine
+        if connections is None:
+            connections = app.config.get('PREWARM_CONNECTIONS') or getattr(engine.pool, 'size', lambda: 1)()
+        opened = [engine.connect() for _ in range(max(int(connections), 1))]
+        for conn in opened:
+            conn.close()
+
+        # 结果不重要，只为让 compiled cache 里有这些语句
+        User.query.filter_by(username='').first()
+        Product.query.get(0)
+        db.session.execute(select(Product).filter_by(product_id=0).with_for_update()).scalar_one_or_none()
+        Category.query.order_by(Category.category_id.desc()).limit(1).all()
+        StockOperation.query.filter_by(order_id='').first()
+        db.session.remove()
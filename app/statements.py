@@ -0,0 +1,25 @@
+"""热点接口的预构建语句。
+
+语句对象在模块加载时建好一次，请求里只换绑定参数：省掉每次拼 Query 的开销，
+cache key 也只算一次，之后每次执行都直接命中 engine 的 compiled cache。
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import configure_mappers, joinedload
+
+from .models import Product, User
+
+# Product.category / Product.supplier 是 backref，mapper 配置之后才存在
+configure_mappers()
+
+# role_required：按 JWT identity 取当前用户
+USER_BY_USERNAME = select(User).where(User.username == bindparam('username'))
+
+# get_product：商品连同分类、供应商一次查出，序列化时不再懒加载
+PRODUCT_DETAIL = (
+    select(Product)
+    .options(joinedload(Product.category), joinedload(Product.supplier))
+    .where(Product.product_id == bindparam('product_id'))
+)
+
+# 出入库、调整、下单：锁住商品行
+PRODUCT_FOR_UPDATE = select(Product).where(Product.product_id == bindparam('product_id')).with_for_update()
@@ -1,17 +1,22 @@
-from flask import Blueprint, request, g
+from flask import Blueprint, current_app, request, g
 from .models import Product, StockOperation, Order
 from . import db
-from .utils import role_required, Response, ValidationError, NotFoundError
-from .schemas import stock_operation_to_dict
-from sqlalchemy import select
+from .utils import role_required, Response, AppError, ValidationError, NotFoundError
+from .schemas import STOCK_OPERATION_FIELDS, load_options, parse_fields, stock_operation_to_dict
+from .statements import PRODUCT_FOR_UPDATE
+from .transactions import transactional
+from .coalescing import Coalescer
+from . import archive, cache, counters
 from sqlalchemy import or_
-from sqlalchemy.orm import joinedload
 from decimal import Decimal
 from typing import Optional
 from datetime import datetime, timedelta
 
 bp = Blueprint('stock', __name__)
 
+# 出库组提交（STOCK_OUT_COALESCE_WINDOW_MS > 0 时启用）
+stock_out_coalescer = Coalescer('stock_out.coalesce')
+
 ALLOWED_STOCK_REASONS = {'purchase', 'sale', 'adjustment', 'damaged', 'expired', 'transfer'}
 
 def normalize_stock_reason(op_type: str, raw_reason: Optional[str]):
@@ -56,11 +61,13 @@ def stock_in():
         if not order:
             raise ValidationError('Order not found')
     
-    with db.session.begin():
+    operator_id = g.current_user.user_id
+
+    # 整段事务单元，遇到死锁/锁超时会自动重放
+    @transactional
+    def unit_of_work():
         # 使用行锁防止并发问题
-        product = db.session.execute(
-            select(Product).filter_by(product_id=product_id).with_for_update()
-        ).scalar_one_or_none()
+        product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
         
         if not product:
             raise NotFoundError('Product not found')
@@ -68,6 +75,7 @@ def stock_in():
         # 执行入库操作
         before_stock = product.stock
         product.stock += quantity
+        counters.Deltas().add(product.category_id, product.supplier_id, stock=quantity).apply()
         
         # 更新商品状态
         update_product_status(product)
@@ -89,15 +97,19 @@ def stock_in():
             order_id=order_id,
             unit_price=unit_price,
             total_price=unit_price * quantity,
-            operator_id=g.current_user.user_id,
-            user_id=g.current_user.user_id,
+            operator_id=operator_id,
+            user_id=operator_id,
             operator_action='stock_in',
             reason=reason,
             notes=notes,
         )
         db.session.add(so)
-    
-    return Response.success({'operation_id': so.op_id})
+        db.session.flush()
+        return so.op_id
+
+    op_id = unit_of_work()
+    cache.bump('stock')
+    return Response.success({'operation_id': op_id})
 
 @bp.route('/out', methods=['POST'])
 @role_required(['admin', 'stock_operator', 'cashier'])
@@ -121,52 +133,109 @@ def stock_out():
         if not order:
             raise ValidationError('Order not found')
     
-    with db.session.begin():
+    payload = {
+        'quantity': quantity,
+        'unit_price_raw': unit_price_raw,
+        'raw_reason': raw_reason,
+        'order_id': order_id,
+        'operator_id': g.current_user.user_id,
+    }
+
+    # 开启合并后，同一商品几毫秒内的并发出库共用一个事务
+    window_ms = current_app.config.get('STOCK_OUT_COALESCE_WINDOW_MS', 0)
+    if window_ms:
+        try:
+            op_id = stock_out_coalescer.submit(
+                product_id, payload, _execute_stock_out_batch,
+                window=window_ms / 1000.0,
+                max_batch=current_app.config.get('STOCK_OUT_COALESCE_MAX_BATCH', 64),
+                timeout=current_app.config.get('STOCK_OUT_COALESCE_WAIT_SECONDS', 120),
+            )
+        except TimeoutError:
+            # 那一批可能稍后还会提交，让调用方先查流水再决定要不要重试
+            raise AppError('Stock out result unknown, check stock operations before retrying', 504)
+        cache.bump('stock')
+        return Response.success({'operation_id': op_id})
+
+    # 整段事务单元，遇到死锁/锁超时会自动重放
+    @transactional
+    def unit_of_work():
         # 使用行锁防止并发问题
-        product = db.session.execute(
-            select(Product).filter_by(product_id=product_id).with_for_update()
-        ).scalar_one_or_none()
+        product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
         
         if not product:
             raise NotFoundError('Product not found')
-        
-        # 检查库存是否足够
-        if product.stock < quantity:
-            raise ValidationError('Insufficient stock')
-        
-        # 执行出库操作
-        before_stock = product.stock
-        product.stock -= quantity
-        
-        # 更新商品状态
-        update_product_status(product)
 
-        if unit_price_raw is not None:
-            unit_price = Decimal(str(unit_price_raw))
-        else:
-            unit_price = product.sale_price
+        so = _apply_stock_out(product, payload)
+        counters.Deltas().add(product.category_id, product.supplier_id, stock=-so.quantity).apply()
+        db.session.flush()
+        return so.op_id
 
-        reason, notes = normalize_stock_reason('out', raw_reason)
-        
-        # 记录库存操作
-        so = StockOperation(
-            product_id=product_id,
-            op_type='out',
-            quantity=quantity,
-            stock_before=before_stock,
-            stock_after=product.stock,
-            order_id=order_id,
-            unit_price=unit_price,
-            total_price=unit_price * quantity,
-            operator_id=g.current_user.user_id,
-            user_id=g.current_user.user_id,
-            operator_action='stock_out',
-            reason=reason,
-            notes=notes,
-        )
-        db.session.add(so)
+    op_id = unit_of_work()
+    cache.bump('stock')
+    return Response.success({'operation_id': op_id})
+
+def _apply_stock_out(product, payload):
+    """在已锁住的商品上扣减库存并记一条出库流水（不提交）。"""
+    quantity = payload['quantity']
+
+    # 检查库存是否足够
+    if product.stock < quantity:
+        raise ValidationError('Insufficient stock')
+    
+    # 执行出库操作
+    before_stock = product.stock
+    product.stock -= quantity
     
-    return Response.success({'operation_id': so.op_id})
+    # 更新商品状态
+    update_product_status(product)
+
+    if payload['unit_price_raw'] is not None:
+        unit_price = Decimal(str(payload['unit_price_raw']))
+    else:
+        unit_price = product.sale_price
+
+    reason, notes = normalize_stock_reason('out', payload['raw_reason'])
+    
+    # 记录库存操作
+    so = StockOperation(
+        product_id=product.product_id,
+        op_type='out',
+        quantity=quantity,
+        stock_before=before_stock,
+        stock_after=product.stock,
+        order_id=payload['order_id'],
+        unit_price=unit_price,
+        total_price=unit_price * quantity,
+        operator_id=payload['operator_id'],
+        user_id=payload['operator_id'],
+        operator_action='stock_out',
+        reason=reason,
+        notes=notes,
+    )
+    db.session.add(so)
+    return so
+
+@transactional
+def _execute_stock_out_batch(product_id, payloads):
+    """合并出库：锁一次商品行、按到达顺序逐笔扣减，一次提交。
+
+    库存不够的那一笔单独失败，不影响同批其他请求。
+    """
+    product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
+    if not product:
+        raise NotFoundError('Product not found')
+
+    before_stock = product.stock
+    results = []
+    for payload in payloads:
+        try:
+            results.append(_apply_stock_out(product, payload))
+        except ValidationError as e:
+            results.append(e)
+    counters.Deltas().add(product.category_id, product.supplier_id, stock=product.stock - before_stock).apply()
+    db.session.flush()
+    return [r if isinstance(r, Exception) else r.op_id for r in results]
 
 @bp.route('/adjust', methods=['POST'])
 @role_required(['admin', 'stock_operator'])
@@ -181,11 +250,13 @@ def adjust_stock():
     if not product_id:
         raise ValidationError('Product ID is required')
     
-    with db.session.begin():
+    operator_id = g.current_user.user_id
+
+    # 整段事务单元，遇到死锁/锁超时会自动重放
+    @transactional
+    def unit_of_work():
         # 使用行锁防止并发问题
-        product = db.session.execute(
-            select(Product).filter_by(product_id=product_id).with_for_update()
-        ).scalar_one_or_none()
+        product = db.session.execute(PRODUCT_FOR_UPDATE, {'product_id': product_id}).scalar_one_or_none()
         
         if not product:
             raise NotFoundError('Product not found')
@@ -196,6 +267,7 @@ def adjust_stock():
         
         # 执行调整操作
         product.stock = new_stock
+        counters.Deltas().add(product.category_id, product.supplier_id, stock=quantity).apply()
         
         # 更新商品状态
         update_product_status(product)
@@ -212,15 +284,19 @@ def adjust_stock():
             stock_after=product.stock,
             unit_price=product.purchase_price,
             total_price=product.purchase_price * abs(quantity),
-            operator_id=g.current_user.user_id,
-            user_id=g.current_user.user_id,
+            operator_id=operator_id,
+            user_id=operator_id,
             operator_action='stock_adjust',
             reason=reason,
             notes=merged_notes,
         )
         db.session.add(so)
-    
-    return Response.success({'operation_id': so.op_id})
+        db.session.flush()
+        return so.op_id
+
+    op_id = unit_of_work()
+    cache.bump('stock')
+    return Response.success({'operation_id': op_id})
 
 @bp.route('/operations', methods=['GET'])
 @role_required(['admin', 'stock_operator', 'finance', 'viewer'])
@@ -232,8 +308,7 @@ def get_stock_operations():
     keyword = (request.args.get('keyword') or '').strip()
     start_date = (request.args.get('start_date') or '').strip()
     end_date = (request.args.get('end_date') or '').strip()
-
-    q = StockOperation.query.options(joinedload(StockOperation.product))
+    fields = parse_fields(request.args.get('fields'), STOCK_OPERATION_FIELDS)
 
     def parse_dt(value: str, is_end: bool):
         if not value:
@@ -245,41 +320,45 @@ def get_stock_operations():
             return datetime.fromisoformat(value)
         except ValueError:
             return None
+
+    start_dt = parse_dt(start_date, False)
+    end_dt = parse_dt(end_date, True)
+
+    # 不传 start_date 只查热表；起始时间早于归档边界时连归档表一起查
+    Ops = archive.source(start_dt, end_dt) if start_dt else StockOperation
+    q = db.session.query(Ops).options(*load_options(Ops, STOCK_OPERATION_FIELDS, fields, ('product',)))
     
     # 过滤条件
     if product_id:
-        q = q.filter_by(product_id=product_id)
+        q = q.filter(Ops.product_id == product_id)
     if op_type:
-        q = q.filter_by(op_type=op_type)
+        q = q.filter(Ops.op_type == op_type)
     if keyword:
-        q = q.join(StockOperation.product).filter(or_(
+        q = q.join(Ops.product).filter(or_(
             Product.product_code.ilike(f'%{keyword}%'),
             Product.product_name.ilike(f'%{keyword}%'),
         ))
 
-    start_dt = parse_dt(start_date, False)
     if start_dt:
-        q = q.filter(StockOperation.created_at >= start_dt)
-
-    end_dt = parse_dt(end_date, True)
+        q = q.filter(Ops.created_at >= start_dt)
     if end_dt:
-        q = q.filter(StockOperation.created_at <= end_dt)
+        q = q.filter(Ops.created_at <= end_dt)
     
     # 按时间倒序排列
-    q = q.order_by(StockOperation.created_at.desc())
+    q = q.order_by(Ops.created_at.desc())
     
     total = q.count()
     items = q.offset((page-1)*size).limit(size).all()
     
     return Response.pagination(
-        [stock_operation_to_dict(item) for item in items], 
+        [stock_operation_to_dict(item, fields) for item in items], 
         total, page, size
     )
 
 @bp.route('/operations/<int:op_id>', methods=['GET'])
 @role_required(['admin', 'stock_operator', 'finance', 'viewer'])
 def get_stock_operation(op_id):
-    operation = StockOperation.query.get(op_id)
+    operation = archive.get_operation(op_id)
     if not operation:
         raise NotFoundError('Stock operation not found')
     return Response.success(stock_operation_to_dict(operation))
@@ -1,9 +1,7 @@
 from flask import Blueprint, request
-from sqlalchemy import func
-
-from . import db
+from . import counters, db
 from .models import Supplier, Product
-from .schemas import supplier_to_dict
+from .schemas import SUPPLIER_FIELDS, supplier_to_dict, load_options, parse_fields
 from .utils import Response, ValidationError, NotFoundError, role_required
 
 bp = Blueprint('suppliers', __name__)
@@ -14,33 +12,19 @@ def list_suppliers():
     page = int(request.args.get('page', 1))
     size = int(request.args.get('size', 20))
     keyword = (request.args.get('keyword') or '').strip()
+    fields = parse_fields(request.args.get('fields'), SUPPLIER_FIELDS)
 
-    q = db.session.query(Supplier)
+    q = db.session.query(Supplier).options(*load_options(Supplier, SUPPLIER_FIELDS, fields))
     if keyword:
         q = q.filter(Supplier.supplier_name.ilike(f'%{keyword}%'))
 
     total = q.count()
     rows = q.order_by(Supplier.supplier_id.desc()).offset((page - 1) * size).limit(size).all()
 
-    supplier_ids = [x.supplier_id for x in rows]
-    stats_map = {}
-    if supplier_ids:
-        stats_rows = (
-            db.session.query(
-                Product.supplier_id.label('supplier_id'),
-                func.count(Product.product_id).label('product_count'),
-                func.coalesce(func.sum(Product.stock), 0).label('total_stock'),
-            )
-            .filter(Product.supplier_id.in_(supplier_ids))
-            .group_by(Product.supplier_id)
-            .all()
-        )
-        stats_map = {
-            r.supplier_id: {'product_count': int(r.product_count), 'total_stock': int(r.total_stock)}
-            for r in stats_rows
-        }
-
-    payload = [supplier_to_dict(item, stats_map.get(item.supplier_id, {'product_count': 0, 'total_stock': 0})) for item in rows]
+    if fields:
+        payload = [supplier_to_dict(item, fields=fields) for item in rows]
+    else:
+        payload = [supplier_to_dict(item, counters.stats(item)) for item in rows]
     return Response.pagination(payload, total, page, size)
 
 
@@ -71,7 +55,7 @@ def get_supplier(supplier_id: int):
     supplier = Supplier.query.get(supplier_id)
     if not supplier:
         raise NotFoundError('Supplier not found')
-    return Response.success(supplier_to_dict(supplier))
+    return Response.success(supplier_to_dict(supplier, counters.stats(supplier)))
 
 
 @bp.route('/<int:supplier_id>', methods=['PUT'])
@@ -99,7 +83,7 @@ def update_supplier(supplier_id: int):
         supplier.address = (data.get('address') or '').strip() or None
 
     db.session.commit()
-    return Response.success(supplier_to_dict(supplier))
+    return Response.success(supplier_to_dict(supplier, counters.stats(supplier)))
 
 
 @bp.route('/<int:supplier_id>', methods=['DELETE'])
@@ -0,0 +1,74 @@
+"""事务重试：死锁、锁等待超时时整段重放。
+
+被装饰的函数就是一个完整的事务单元，里面只做数据库读写，不碰请求对象；
+遇到可重试的数据库错误时回滚、随机退避后从头再跑，超过次数才把异常抛出去。
+"""
+import random
+import time
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy.exc import DBAPIError
+
+from . import db, metrics
+
+# MySQL: 1213 死锁, 1205 锁等待超时
+_MYSQL_RETRYABLE = {1205, 1213}
+# PostgreSQL: 40001 串行化失败, 40P01 死锁
+_PG_RETRYABLE = {'40001', '40P01'}
+
+
+def is_retryable_db_error(exc: BaseException) -> bool:
+    if not isinstance(exc, DBAPIError) or exc.connection_invalidated:
+        return False
+    orig = exc.orig
+    args = getattr(orig, 'args', ())
+    if args and isinstance(args[0], int) and args[0] in _MYSQL_RETRYABLE:
+        return True
+    if getattr(orig, 'pgcode', None) in _PG_RETRYABLE:
+        return True
+    # SQLite 没有错误码，只能看文案
+    message = str(orig).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def _begin_write(session) -> None:
+    """SQLite 忽略 FOR UPDATE，pysqlite 又要等到第一条 DML 才 BEGIN，读到的库存可能已过期。
+
+    写事务单元一开始就 BEGIN IMMEDIATE 拿写锁，效果等同于给整段加行锁；
+    等锁由 busy_timeout 负责，等不到报 "database is locked" 再交给外层重试。
+    """
+    conn = session.connection()
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def transactional(fn):
+    """在 db.session.begin() 里执行 fn，遇到死锁/锁超时按 DB_TX_RETRIES 次数重放。"""
+    # 视图里的嵌套函数按外层视图名记，stock_in.<locals>.unit_of_work -> stock_in
+    name = fn.__qualname__.split('.')[0]
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        retries = int(current_app.config.get('DB_TX_RETRIES', 3))
+        base_delay = float(current_app.config.get('DB_TX_RETRY_BASE_DELAY', 0.02))
+        attempt = 0
+        while True:
+            # role_required 查用户时 session 已经自动开了事务，先结束它
+            db.session.rollback()
+            try:
+                with db.session.begin():
+                    _begin_write(db.session)
+                    return fn(*args, **kwargs)
+            except DBAPIError as e:
+                if not is_retryable_db_error(e):
+                    raise
+                if attempt >= retries:
+                    metrics.inc('db.tx_retry_exhausted')
+                    raise
+                attempt += 1
+                metrics.inc('db.tx_retry')
+                metrics.inc(f'db.tx_retry.{name}')
+                # 指数退避 + 全抖动，避免冲突双方同时重来又撞上
+                time.sleep(random.uniform(0, min(base_delay * (2 ** attempt), 0.5)))
+    return wrapper
@@ -1,7 +1,8 @@
 from functools import wraps
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import g, jsonify
-from .models import User
+from . import db
+from .statements import USER_BY_USERNAME
 
 # 自定义异常类
 class AppError(Exception):
@@ -68,7 +69,7 @@ def role_required(roles):
         @jwt_required()
         def wrapper(*args, **kwargs):
             identity = get_jwt_identity()
-            user = User.query.filter_by(username=identity).first()
+            user = db.session.execute(USER_BY_USERNAME, {'username': identity}).scalar_one_or_none()
             if not user:
                 raise NotFoundError("User not found")
             if user.role not in allowed:
@@ -76,4 +77,26 @@ def role_required(roles):
             g.current_user = user
             return fn(*args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+# 批量接口的 ids 参数：逗号分隔，去重保序
+def parse_ids(raw, cast=str, limit=200, name='ids'):
+    ids = []
+    seen = set()
+    for part in (raw or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            value = cast(part)
+        except ValueError:
+            raise ValidationError(f'{name} must be a comma separated list')
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if not ids:
+        raise ValidationError(f'{name} is required')
+    if len(ids) > limit:
+        raise ValidationError(f'At most {limit} {name} per request')
+    return ids
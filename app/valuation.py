@@ -0,0 +1,206 @@
+"""库存估值：按流水计算每个商品的移动加权平均成本和 FIFO 成本。
+
+入库（以及数量变多的调整）按流水的 unit_price 计成本；出库按当时的平均成本 / 最早的批次转出。
+每个已结束的日期算完后落一份检查点（ValuationCheckpoint），下次只重放检查点之后的流水。
+"""
+import json
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from . import archive, db, metrics
+from .models import Product, StockOperation, ValuationCheckpoint
+from .transactions import transactional
+
+COST_PLACES = Decimal('0.0001')
+MONEY_PLACES = Decimal('0.01')
+CHECKPOINT_CHUNK = 1000
+
+
+class CostState:
+    """单个商品的成本状态。"""
+    __slots__ = ('quantity', 'avg_cost', 'layers', 'shortfall', 'last_op_id', 'dirty')
+
+    def __init__(self, quantity=0, avg_cost=Decimal('0'), layers=(), last_op_id=0):
+        self.quantity = quantity
+        self.avg_cost = avg_cost
+        self.layers = deque([q, p] for q, p in layers)
+        # 出库超过已知批次的部分（历史流水不完整时会出现），后续入库先补这个窟窿
+        self.shortfall = 0
+        self.last_op_id = last_op_id
+        self.dirty = False
+
+    @classmethod
+    def from_checkpoint(cls, cp):
+        layers = [(q, Decimal(p)) for q, p in json.loads(cp.fifo_layers)]
+        state = cls(cp.quantity, Decimal(cp.avg_cost), layers, cp.last_op_id)
+        # 批次总数 - 缺口 恒等于结存数量，缺口不用单独存
+        state.shortfall = max(sum(q for q, _ in layers) - cp.quantity, 0)
+        return state
+
+    def apply(self, op_id, delta, unit_price):
+        self.last_op_id = op_id
+        self.dirty = True
+        if delta > 0:
+            price = Decimal(unit_price or 0)
+            if self.quantity <= 0:
+                self.avg_cost = price
+            else:
+                total = self.avg_cost * self.quantity + price * delta
+                self.avg_cost = (total / (self.quantity + delta)).quantize(COST_PLACES)
+            self.quantity += delta
+            covered = min(self.shortfall, delta)
+            self.shortfall -= covered
+            if delta > covered:
+                self.layers.append([delta - covered, price])
+        elif delta < 0:
+            self.quantity += delta
+            remaining = -delta
+            while remaining and self.layers:
+                layer = self.layers[0]
+                take = min(layer[0], remaining)
+                layer[0] -= take
+                remaining -= take
+                if not layer[0]:
+                    self.layers.popleft()
+            self.shortfall += remaining
+
+    @property
+    def avg_value(self):
+        return (self.avg_cost * max(self.quantity, 0)).quantize(MONEY_PLACES)
+
+    @property
+    def fifo_value(self):
+        return sum((p * q for q, p in self.layers), Decimal('0')).quantize(MONEY_PLACES)
+
+    def to_dict(self):
+        fifo_value = self.fifo_value
+        quantity = max(self.quantity, 0)
+        return {
+            'quantity': self.quantity,
+            'avg_unit_cost': float(self.avg_cost),
+            'avg_value': float(self.avg_value),
+            'fifo_unit_cost': float((fifo_value / quantity).quantize(COST_PLACES)) if quantity else 0.0,
+            'fifo_value': float(fifo_value),
+        }
+
+    def to_checkpoint(self, product_id, checkpoint_date):
+        return {
+            'product_id': product_id,
+            'checkpoint_date': checkpoint_date,
+            'last_op_id': self.last_op_id,
+            'quantity': self.quantity,
+            'avg_cost': self.avg_cost,
+            'fifo_layers': json.dumps([[q, str(p)] for q, p in self.layers]),
+        }
+
+
+def _product_filter(product_ids=None, category_id=None, supplier_id=None):
+    """返回限定商品范围的 IN 子查询，不限定时返回 None。"""
+    if product_ids is None and category_id is None and supplier_id is None:
+        return None
+    q = select(Product.product_id)
+    if product_ids is not None:
+        q = q.where(Product.product_id.in_(product_ids))
+    if category_id is not None:
+        q = q.where(Product.category_id == category_id)
+    if supplier_id is not None:
+        q = q.where(Product.supplier_id == supplier_id)
+    return q
+
+
+def _latest_checkpoints(as_of: date, scope):
+    """每个商品在 as_of 当天或之前最近的一个检查点。"""
+    latest = (
+        select(ValuationCheckpoint.product_id, func.max(ValuationCheckpoint.checkpoint_date).label('checkpoint_date'))
+        .where(ValuationCheckpoint.checkpoint_date <= as_of)
+        .group_by(ValuationCheckpoint.product_id)
+    )
+    if scope is not None:
+        latest = latest.where(ValuationCheckpoint.product_id.in_(scope))
+    latest = latest.subquery()
+    return (
+        select(ValuationCheckpoint)
+        .join(latest, and_(ValuationCheckpoint.product_id == latest.c.product_id,
+                           ValuationCheckpoint.checkpoint_date == latest.c.checkpoint_date))
+    )
+
+
+def compute(as_of: date, product_ids=None, category_id=None, supplier_id=None, persist=False):
+    """计算 as_of 日末的估值，返回 {product_id: CostState}。
+
+    persist=True 时把结果落成 as_of 的检查点，只给定时任务和归档用（as_of 须早于今天，当天的流水还会变）；
+    报表接口只读不写。
+    """
+    started = time.perf_counter()
+    scope = _product_filter(product_ids, category_id, supplier_id)
+    states = {
+        cp.product_id: CostState.from_checkpoint(cp)
+        for cp in db.session.execute(_latest_checkpoints(as_of, scope)).scalars()
+    }
+
+    # 只重放检查点之后的流水；没有检查点的商品从头算
+    watermarks = (
+        _latest_checkpoints(as_of, scope)
+        .with_only_columns(ValuationCheckpoint.product_id, ValuationCheckpoint.last_op_id)
+        .subquery()
+    )
+    end = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+    # 归档前会落截止日前一天的检查点，估值日期不早于它时归档的流水都已算进检查点；
+    # 更早的日期，检查点之后的流水可能已经搬走（哪怕晚于归档里最后一条），要连归档表一起读
+    Ops = StockOperation
+    cutoff = archive.cutoff()
+    if cutoff is not None and as_of < cutoff - timedelta(days=1):
+        Ops = archive.source(until=end)
+    ops = (
+        select(Ops.product_id, Ops.op_id, Ops.stock_before, Ops.stock_after, Ops.unit_price)
+        .outerjoin(watermarks, watermarks.c.product_id == Ops.product_id)
+        .where(Ops.created_at < end)
+        .where(or_(watermarks.c.last_op_id.is_(None), Ops.op_id > watermarks.c.last_op_id))
+        .order_by(Ops.product_id, Ops.op_id)
+    )
+    if scope is not None:
+        ops = ops.where(Ops.product_id.in_(scope))
+
+    replayed = 0
+    result = db.session.execute(ops.execution_options(stream_results=True, yield_per=5000))
+    for product_id, op_id, before, after, unit_price in result:
+        state = states.get(product_id)
+        if state is None:
+            state = states[product_id] = CostState()
+        state.apply(op_id, after - before, unit_price)
+        replayed += 1
+
+    metrics.inc('valuation.replayed_ops', replayed)
+    metrics.observe('valuation.seconds', time.perf_counter() - started)
+
+    if persist:
+        save_checkpoints(as_of, states)
+    return states
+
+
+def save_checkpoints(as_of: date, states) -> int:
+    """把有新流水的商品状态写成 as_of 的检查点，返回写入条数。"""
+    rows = [s.to_checkpoint(pid, as_of) for pid, s in states.items() if s.dirty]
+    for i in range(0, len(rows), CHECKPOINT_CHUNK):
+        chunk = rows[i:i + CHECKPOINT_CHUNK]
+        try:
+            _write_checkpoints(as_of, chunk)
+        except IntegrityError:
+            # 别的 worker 同时在写同一天的检查点，内容一样，让给它
+            metrics.inc('valuation.checkpoint_conflict')
+    metrics.inc('valuation.checkpoints_written', len(rows))
+    return len(rows)
+
+
+@transactional
+def _write_checkpoints(as_of, chunk):
+    ValuationCheckpoint.query.filter(
+        ValuationCheckpoint.checkpoint_date == as_of,
+        ValuationCheckpoint.product_id.in_([r['product_id'] for r in chunk]),
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(ValuationCheckpoint, chunk)
@@ -0,0 +1,85 @@
+"""ABC/XYZ 分类：整目录一次计算的耗时（聚合查询 + NumPy），以及缓存命中后的耗时。
+
+    python benchmarks/abc_xyz.py --products 200000 --days 365 --sales-per-day 20000
+
+用临时 SQLite 文件造一份销售流水，分别打印聚合查询和 NumPy 计算各自的耗时。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db, metrics  # noqa: E402
+from app.abc_xyz import compute, page, results  # noqa: E402
+from app.models import Category, Product, StockOperation, User  # noqa: E402
+
+
+def seed(products, days, per_day, start):
+    db.session.add(User(username='bench', password_hash='x', role='admin'))
+    db.session.add(Category(category_name='bench'))
+    db.session.flush()
+    for i in range(0, products, 50000):
+        db.session.bulk_insert_mappings(Product, [
+            {'product_id': pid, 'product_code': f'B{pid}', 'product_name': 'bench', 'category_id': 1,
+             'purchase_price': 1, 'sale_price': 2, 'stock': 0}
+            for pid in range(i + 1, min(i + 50000, products) + 1)
+        ])
+    rng = random.Random(7)
+    # 销量按幂律分布，少数商品贡献大部分销售额，分类结果才像样
+    weights = [1 / (k + 1) for k in range(products)]
+    for d in range(days):
+        ts = datetime.combine(start + timedelta(days=d), datetime.min.time()) + timedelta(hours=12)
+        pids = rng.choices(range(1, products + 1), weights=weights, k=per_day)
+        db.session.bulk_insert_mappings(StockOperation, [
+            {'product_id': pid, 'op_type': 'out', 'reason': 'sale', 'quantity': 1, 'stock_before': 1,
+             'stock_after': 0, 'unit_price': 2, 'total_price': 2, 'operator_id': 1,
+             'operator_action': 'bench', 'created_at': ts}
+            for pid in pids
+        ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--sales-per-day', type=int, default=20000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-abc-'), 'ledger.db')
+
+    class Config:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        JWT_SECRET_KEY = 'bench'
+
+    app = create_app(Config, with_scheduler=False)
+    start = date(2025, 1, 1)
+    end = start + timedelta(days=args.days - 1)
+    with app.app_context():
+        db.create_all()
+        began = time.perf_counter()
+        seed(args.products, args.days, args.sales_per_day, start)
+        print(f'seeded {args.products} products, {args.days * args.sales_per_day} sales '
+              f'in {time.perf_counter() - began:.1f}s')
+
+        began = time.perf_counter()
+        result = results.get_or_compute((start, end), lambda: compute(start, end))
+        cold = time.perf_counter() - began
+        began = time.perf_counter()
+        results.get_or_compute((start, end), lambda: compute(start, end))
+        page(result, 'AX', 1, 50)
+        warm = time.perf_counter() - began
+        print(f'compute {cold:.2f}s (numpy + query), cached page {warm * 1000:.2f}ms')
+        print({cls: v['products'] for cls, v in result['summary'].items()})
+        print('timings:', metrics.snapshot()['timings'].get('abc_xyz.seconds'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""冷启动耗时：导入、create_app、（可选）预热、第一个请求。
+
+    python benchmarks/cold_start.py --runs 7
+
+每轮起一个新解释器，取各阶段中位数；first_request 即 time-to-first-request
+里除去导入和建应用之后的部分。
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PHASES = ('import', 'create_app', 'prewarm', 'first_request', 'total')
+
+
+def seed(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.models import Category
+
+    app = create_app(with_scheduler=False)
+    with app.app_context():
+        db.create_all()
+        for i in range(50):
+            db.session.add(Category(category_name=f'bench {i}'))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--path', default='/api/categories')
+    parser.add_argument('--config', action='store_true', help='load app.config.Config (needs its DATABASE_URL)')
+    args = parser.parse_args()
+
+    from app.startup import measure_cold_start
+
+    env = dict(os.environ)
+    if not args.config:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-cold-'), 'bench.db')}"
+        seed(database_url)
+        env['DATABASE_URL'] = database_url
+
+    print(f"{'variant':<10}" + ''.join(f'{p:>15}' for p in PHASES))
+    for variant, prewarm in (('plain', False), ('prewarm', True)):
+        runs = [measure_cold_start(args.path, args.config, prewarm, env=env)[0] for _ in range(args.runs)]
+        medians = [statistics.median(r[p] for r in runs) * 1000 for p in PHASES]
+        print(f'{variant:<10}' + ''.join(f'{m:>12.1f} ms' for m in medians))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""各引擎档位下的并发写入吞吐。
+
+    python benchmarks/engine_profiles.py --writers 8 --readers 4 --duration 5
+    python benchmarks/engine_profiles.py --mysql-url mysql+pymysql://u:p@host/bench
+
+写线程模拟入库：锁商品行、改库存、写一条 StockOperation；读线程同时翻商品列表。
+SQLite 比较 default（回滚日志）和 sqlite-edge（WAL），给了 MySQL 地址再比较
+default 和 mysql-prod。每个档位用一个新库。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Category, Product, StockOperation, User  # noqa: E402
+
+PRODUCTS = 50
+
+
+class Config:
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JWT_SECRET_KEY = 'bench'
+    SCHEDULER_ENABLED = False
+
+
+def build_app(database_url, profile):
+    config = type('BenchConfig', (Config,), {'SQLALCHEMY_DATABASE_URI': database_url, 'DB_ENGINE_PROFILE': profile})
+    app = create_app(config, with_scheduler=False)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(username='bench', password_hash='x', role='admin'))
+        db.session.add(Category(category_name='bench'))
+        db.session.flush()
+        for i in range(PRODUCTS):
+            db.session.add(Product(product_code=f'B{i:05d}', product_name=f'bench {i}', category_id=1,
+                                   purchase_price=Decimal('1.00'), sale_price=Decimal('2.00'), stock=0))
+        db.session.commit()
+    return app
+
+
+def writer(app, stop_at, stats):
+    rnd = random.Random()
+    with app.app_context():
+        while time.time() < stop_at:
+            product_id = rnd.randint(1, PRODUCTS)
+            try:
+                with db.session.begin():
+                    product = db.session.execute(
+                        select(Product).filter_by(product_id=product_id).with_for_update()
+                    ).scalar_one()
+                    before = product.stock
+                    product.stock += 1
+                    db.session.add(StockOperation(
+                        product_id=product_id, op_type='in', quantity=1, stock_before=before,
+                        stock_after=product.stock, unit_price=Decimal('1.00'), total_price=Decimal('1.00'),
+                        operator_id=1, user_id=1, operator_action='stock_in', reason='purchase',
+                    ))
+                stats['commits'] += 1
+            except OperationalError:
+                db.session.rollback()
+                stats['errors'] += 1
+
+
+def reader(app, stop_at, stats):
+    with app.app_context():
+        while time.time() < stop_at:
+            Product.query.order_by(Product.product_id).limit(20).all()
+            db.session.remove()
+            stats['reads'] += 1
+
+
+def run(name, database_url, profile, args):
+    app = build_app(database_url, profile)
+    stats = {'commits': 0, 'errors': 0, 'reads': 0}
+    stop_at = time.time() + args.duration
+    threads = [threading.Thread(target=writer, args=(app, stop_at, stats)) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(app, stop_at, stats)) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app.app_context():
+        db.engine.dispose()
+    print(f"{name:<18} {stats['commits'] / args.duration:>9.1f} tx/s  {stats['reads'] / args.duration:>9.1f} reads/s  "
+          f"{stats['errors']:>5} lock errors")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--mysql-url')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='bench-engine-')
+    for profile in ('default', 'sqlite-edge'):
+        run(f'sqlite/{profile}', f"sqlite:///{os.path.join(tmpdir, profile + '.db')}", profile, args)
+    if args.mysql_url:
+        for profile in ('default', 'mysql-prod'):
+            run(f'mysql/{profile}', args.mysql_url, profile, args)
+
+
+if __name__ == '__main__':
+    main()
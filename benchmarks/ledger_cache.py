@@ -0,0 +1,104 @@
+"""按天出入库汇总：ORM 逐条读流水 vs 列式缓存（memmap）上整体计算。
+
+    python benchmarks/ledger_cache.py --products 5000 --ops 2000000
+
+用临时 SQLite 文件造流水，先全量建缓存，再补一批新流水让缓存带着尾巴查；两边结果必须一致。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from app import create_app, db, ledger_cache  # noqa: E402
+from app.models import Category, Product, StockOperation, User  # noqa: E402
+
+
+def seed(products, ops, start, first=1):
+    rng = random.Random(first)
+    batch = []
+    for n in range(ops):
+        op_type = rng.choice(('in', 'out', 'adjust'))
+        qty = rng.randint(-5, 9) if op_type == 'adjust' else rng.randint(1, 20)
+        batch.append({
+            'product_id': rng.randint(1, products), 'op_type': op_type, 'quantity': qty,
+            'stock_before': 0, 'stock_after': 0, 'unit_price': 1, 'total_price': qty,
+            'operator_id': 1, 'operator_action': 'bench', 'created_at': start + timedelta(seconds=n * 7),
+        })
+        if len(batch) == 50000:
+            db.session.bulk_insert_mappings(StockOperation, batch)
+            batch = []
+    db.session.bulk_insert_mappings(StockOperation, batch)
+    db.session.commit()
+
+
+def orm_daily(start, end):
+    # 原来 stock_trend 的做法：ORM 取出区间内全部流水，逐条累加
+    days = (end.date() - start.date()).days + 1
+    result = np.zeros((days, 3), dtype=np.int64)
+    for op in StockOperation.query.filter(StockOperation.created_at >= start, StockOperation.created_at <= end):
+        row = result[(op.created_at.date() - start.date()).days]
+        if op.op_type == 'in':
+            row[0] += op.quantity
+        elif op.op_type == 'out':
+            row[1] += op.quantity
+        else:
+            row[2] += abs(op.quantity)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--ops', type=int, default=2000000)
+    parser.add_argument('--tail', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-ledger-')
+
+    class Config:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(workdir, "ledger.db")}'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        JWT_SECRET_KEY = 'bench'
+        LEDGER_CACHE_DIR = os.path.join(workdir, 'columns')
+
+    app = create_app(Config, with_scheduler=False)
+    start = datetime(2025, 1, 1)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', password_hash='x', role='admin'))
+        db.session.add(Category(category_name='bench'))
+        db.session.flush()
+        db.session.bulk_insert_mappings(Product, [
+            {'product_id': i, 'product_code': f'B{i}', 'product_name': 'bench', 'category_id': 1,
+             'purchase_price': 1, 'sale_price': 2, 'stock': 0}
+            for i in range(1, args.products + 1)
+        ])
+        began = time.perf_counter()
+        seed(args.products, args.ops, start)
+        print(f'seeded {args.ops} ops in {time.perf_counter() - began:.1f}s')
+
+        began = time.perf_counter()
+        ledger_cache.sync(app)
+        print(f'cache build   {time.perf_counter() - began:>8.3f}s')
+        seed(args.products, args.tail, start + timedelta(seconds=args.ops * 7), first=2)
+
+        end = start + timedelta(seconds=(args.ops + args.tail) * 7)
+        began = time.perf_counter()
+        expected = orm_daily(start, end)
+        print(f'ORM rows      {time.perf_counter() - began:>8.3f}s')
+        began = time.perf_counter()
+        actual = ledger_cache.daily_movements(app, start, end)
+        print(f'memmap + tail {time.perf_counter() - began:>8.3f}s')
+        print('consistent:', bool((expected == actual).all()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""整单扫码：逐个编码走 keyword 模糊查询 vs 编码索引一次解析。
+
+    python benchmarks/resolve_codes.py --products 50000 --basket 50
+
+用临时 SQLite 文件造商品，只计服务端处理时间，不含 HTTP。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import or_  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.code_index import index  # noqa: E402
+from app.models import Category, Product  # noqa: E402
+
+
+def keyword_scan(codes):
+    found = {}
+    for code in codes:
+        q = Product.query.filter(or_(Product.product_code.ilike(f'%{code}%'),
+                                     Product.product_name.ilike(f'%{code}%')))
+        for p in q.all():
+            if p.product_code == code:
+                found[code] = p.product_id
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--basket', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-codes-'), 'codes.db')
+
+    class Config:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        JWT_SECRET_KEY = 'bench'
+
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Category(category_name='bench'))
+        db.session.flush()
+        db.session.bulk_insert_mappings(Product, [
+            {'product_code': f'{6900000000000 + i}', 'product_name': f'bench {i}', 'category_id': 1,
+             'purchase_price': 1, 'sale_price': 2, 'stock': 0}
+            for i in range(args.products)
+        ])
+        db.session.commit()
+        rng = random.Random(7)
+        basket = [f'{6900000000000 + rng.randrange(args.products)}' for _ in range(args.basket)]
+
+        began = time.perf_counter()
+        scanned = keyword_scan(basket)
+        print(f'keyword scan  {(time.perf_counter() - began) * 1000:>9.3f}ms / basket')
+
+        index.clear()
+        began = time.perf_counter()
+        resolved = index.resolve(basket)
+        print(f'index (cold)  {(time.perf_counter() - began) * 1000:>9.3f}ms / basket')
+        began = time.perf_counter()
+        for _ in range(args.rounds):
+            index.resolve(basket)
+        print(f'index (warm)  {(time.perf_counter() - began) * 1000 / args.rounds:>9.3f}ms / basket')
+        print('consistent:', scanned == {code: r['product_id'] for code, r in resolved.items()})
+
+
+if __name__ == '__main__':
+    main()
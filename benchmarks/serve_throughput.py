@@ -0,0 +1,119 @@
+"""开发服务器 vs 预 fork 的 gunicorn 吞吐对比。
+
+    python benchmarks/serve_throughput.py --concurrency 32 --duration 10
+
+用临时 SQLite 库起两个服务，压同一组只读接口，打印 req/s 和延迟分位。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEV_SERVER = """
+from app import create_app
+create_app(with_scheduler=False).run(host='127.0.0.1', port={port})
+"""
+
+PROD_SERVER = """
+from app import create_app
+from app.server import serve
+serve(create_app(with_scheduler=False), ['--bind', '127.0.0.1:{port}', '--workers', '{workers}', '--threads', '{threads}', '--no-scheduler'])
+"""
+
+PATHS = ['/api/categories', '/api/suppliers', '/api/products?size=20', '/api/products/1']
+
+
+def seed(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.models import Category, Product, Supplier
+
+    app = create_app(with_scheduler=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Category(category_name='bench'))
+        db.session.add(Supplier(supplier_name='bench'))
+        db.session.flush()
+        for i in range(200):
+            db.session.add(Product(product_code=f'B{i:05d}', product_name=f'bench {i}', category_id=1,
+                                   supplier_id=1, purchase_price=1, sale_price=2, stock=100))
+        db.session.commit()
+
+
+def wait_ready(port, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/categories', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not come up')
+
+
+def hammer(port, concurrency, duration):
+    stop_at = time.time() + duration
+
+    def worker(idx):
+        latencies = []
+        i = idx
+        while time.time() < stop_at:
+            url = f'http://127.0.0.1:{port}{PATHS[i % len(PATHS)]}'
+            started = time.perf_counter()
+            urllib.request.urlopen(url, timeout=10).read()
+            latencies.append(time.perf_counter() - started)
+            i += 1
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    latencies = sorted(x for r in results for x in r)
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def run(name, script, port, args, env):
+    proc = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        stats = hammer(port, args.concurrency, args.duration)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    print(f"{name:<10} {stats['requests']:>8} req  {stats['rps']:>9.1f} req/s  "
+          f"p50 {stats['p50_ms']:>7.2f} ms  p99 {stats['p99_ms']:>7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='bench-serve-')
+    database_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    seed(database_url)
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=ROOT)
+
+    run('dev', DEV_SERVER.format(port=args.port), args.port, args, env)
+    run('gunicorn', PROD_SERVER.format(port=args.port + 1, workers=args.workers, threads=args.threads),
+        args.port + 1, args, env)
+
+
+if __name__ == '__main__':
+    main()
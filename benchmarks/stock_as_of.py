@@ -0,0 +1,107 @@
+"""某时刻库存：全表找每个商品最后一条流水 vs 按 (product_id, created_at) 索引逐商品定位。
+
+    python benchmarks/stock_as_of.py --products 5000 --ops 2000000
+
+用临时 SQLite 文件造一份流水，ts 取时间轴中点，两种写法结果必须一致。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import and_, func, select  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Category, Product, StockOperation, User  # noqa: E402
+from app.reports import stock_as_of_query  # noqa: E402
+
+
+def seed(products, ops, start):
+    db.session.add(User(username='bench', password_hash='x', role='admin'))
+    db.session.add(Category(category_name='bench'))
+    db.session.flush()
+    db.session.bulk_insert_mappings(Product, [
+        {'product_id': i, 'product_code': f'B{i}', 'product_name': 'bench', 'category_id': 1,
+         'purchase_price': 1, 'sale_price': 2, 'stock': 0}
+        for i in range(1, products + 1)
+    ])
+    stock = [0] * (products + 1)
+    rng = random.Random(7)
+    batch = []
+    for n in range(ops):
+        pid = rng.randint(1, products)
+        qty = rng.randint(1, 20)
+        out = stock[pid] >= qty and rng.random() < 0.45
+        after = stock[pid] - qty if out else stock[pid] + qty
+        batch.append({
+            'product_id': pid, 'op_type': 'out' if out else 'in', 'quantity': qty,
+            'stock_before': stock[pid], 'stock_after': after, 'unit_price': 1, 'total_price': qty,
+            'operator_id': 1, 'operator_action': 'bench', 'created_at': start + timedelta(seconds=n),
+        })
+        stock[pid] = after
+        if len(batch) == 50000:
+            db.session.bulk_insert_mappings(StockOperation, batch)
+            batch = []
+    db.session.bulk_insert_mappings(StockOperation, batch)
+    db.session.commit()
+
+
+def full_scan(ts):
+    # 原来的做法：先找每个商品 ts 之前最大的操作时间，再回表取 after_quantity
+    latest = (
+        select(StockOperation.product_id, func.max(StockOperation.created_at).label('created_at'))
+        .where(StockOperation.created_at <= ts)
+        .group_by(StockOperation.product_id)
+        .subquery()
+    )
+    q = (
+        select(StockOperation.product_id, StockOperation.stock_after)
+        .join(latest, and_(StockOperation.product_id == latest.c.product_id,
+                           StockOperation.created_at == latest.c.created_at))
+    )
+    return {pid: stock for pid, stock in db.session.execute(q)}
+
+
+def index_seek(ts):
+    return {pid: ledger for pid, _, _, ledger, _ in db.session.execute(stock_as_of_query(ts)) if ledger is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--ops', type=int, default=2000000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-asof-'), 'ledger.db')
+
+    class Config:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        JWT_SECRET_KEY = 'bench'
+
+    app = create_app(Config, with_scheduler=False)
+    start = datetime(2025, 1, 1)
+    with app.app_context():
+        db.create_all()
+        began = time.perf_counter()
+        seed(args.products, args.ops, start)
+        print(f'seeded {args.ops} ops / {args.products} products in {time.perf_counter() - began:.1f}s')
+        ts = start + timedelta(seconds=args.ops // 2)
+
+        results = {}
+        for name, fn in (('full scan', full_scan), ('index seek', index_seek)):
+            fn(ts)
+            began = time.perf_counter()
+            results[name] = fn(ts)
+            print(f'{name:<12}{time.perf_counter() - began:>8.3f}s  {len(results[name])} products')
+        print('consistent:', results['full scan'] == results['index seek'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,79 @@
+import sys
+
+if __name__ == '__main__' and sys.argv[1:2] == ['startup_report']:
+    from app.startup import startup_report
+
+    startup_report(sys.argv[2:])
+    sys.exit(0)
+
 from app import create_app
 from app.config import Config
 
+if __name__ == '__main__' and sys.argv[1:2] == ['serve']:
+    from app.server import serve
+
+    # 生产模式：gunicorn master 预加载应用，调度器在 master 就绪后单独启动
+    serve(create_app(Config, with_scheduler=False), sys.argv[2:])
+    sys.exit(0)
+
+if __name__ == '__main__' and sys.argv[1:2] == ['repair_counters']:
+    from app.counters import repair
+
+    # 按 products 表重算分类/供应商的商品数和库存合计（上线新列后先跑一次）
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        print(f'Counters repaired: {repair()} rows')
+    sys.exit(0)
+
+if __name__ == '__main__' and sys.argv[1:2] == ['archive_stock_operations']:
+    from app.archive import run
+
+    # 把保留期之前的库存流水搬到归档表，留下月度汇总（平时由每月 1 日的定时任务执行）
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        print(run(app.config['STOCK_OPS_RETENTION_MONTHS'], app.config['STOCK_OPS_ARCHIVE_BATCH']))
+    sys.exit(0)
+
+if __name__ == '__main__' and sys.argv[1:2] == ['sync_ledger_cache']:
+    from app.ledger_cache import sync
+
+    # 把库存流水追加到本地列式缓存（首次会从头建，之后定时任务按水位增量追加）
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        print(f'Ledger cache appended: {sync(app)} rows')
+    sys.exit(0)
+
+if __name__ == '__main__' and sys.argv[1:2] == ['sync_stock_rollup']:
+    from app.rollup import sync
+
+    # 把库存流水累加进小时汇总（首次会从头建，之后定时任务按水位增量累加）
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        print(f'Stock rollup processed: {sync(app.config["STOCK_ROLLUP_BATCH"], app.config["STOCK_ROLLUP_LAG_SECONDS"])} ops')
+    sys.exit(0)
+
+if __name__ == '__main__' and sys.argv[1:2] == ['verify_stock_rollup']:
+    from datetime import date
+
+    from app.rollup import verify
+
+    # 对账小时汇总：python manage.py verify_stock_rollup 2024-01-01 2024-01-31 [--repair]
+    args = [a for a in sys.argv[2:] if a != '--repair']
+    start = date.fromisoformat(args[0]) if args else date.today()
+    end = date.fromisoformat(args[1]) if len(args) > 1 else start
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        mismatches = verify(start, end, repair='--repair' in sys.argv)
+        for item in mismatches:
+            print(item)
+        print(f'Stock rollup mismatches: {len(mismatches)}')
+    sys.exit(1 if mismatches else 0)
+
 app = create_app(Config)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    if app.config.get('APP_PREWARM'):
+        from app.startup import prewarm
+
+        prewarm(app)
+    app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        JWT_SECRET_KEY = 'test'
+        JOBS_DIR = str(tmp_path / 'jobs')
+        LEDGER_CACHE_DIR = str(tmp_path / 'ledger')
+
+    app = create_app(Config, with_scheduler=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password_hash='x', role='admin'))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        token = create_access_token(identity='admin')
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from app.coalescing import Coalescer
+from app.utils import ValidationError
+
+
+def _submit_all(coalescer, payloads, execute, **kwargs):
+    """每个 payload 一个线程并发提交到同一个 key，返回 {payload: 结果或异常}。"""
+    outcomes = {}
+
+    def worker(payload):
+        try:
+            outcomes[payload] = coalescer.submit('k', payload, execute, **kwargs)
+        except BaseException as e:
+            outcomes[payload] = e
+
+    threads = [threading.Thread(target=worker, args=(p,)) for p in payloads]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return outcomes
+
+
+def test_results_and_errors_go_to_their_own_payload():
+    batches = []
+
+    def execute(key, payloads):
+        batches.append(list(payloads))
+        return [ValidationError(f'bad {p}') if p < 0 else p * 10 for p in payloads]
+
+    outcomes = _submit_all(Coalescer('test'), [1, 2, -3, 4], execute, window=1, max_batch=4)
+
+    assert len(batches) == 1 and sorted(batches[0]) == [-3, 1, 2, 4]
+    assert outcomes[1] == 10 and outcomes[2] == 20 and outcomes[4] == 40
+    assert isinstance(outcomes[-3], ValidationError) and outcomes[-3].message == 'bad -3'
+
+
+def test_batch_failure_raises_a_separate_exception_per_waiter():
+    error = ValidationError('Insufficient stock')
+
+    def execute(key, payloads):
+        raise error
+
+    outcomes = _submit_all(Coalescer('test'), [1, 2, 3], execute, window=1, max_batch=3)
+
+    raised = list(outcomes.values())
+    assert all(isinstance(e, ValidationError) and e.code == 400 for e in raised)
+    assert len({id(e) for e in raised}) == 3
+    assert sum(e is error for e in raised) == 1
+    assert all(e.__cause__ is error for e in raised if e is not error)
+
+
+def test_aborted_leader_does_not_leave_followers_reading_empty_results():
+    def execute(key, payloads):
+        raise SystemExit(1)
+
+    outcomes = _submit_all(Coalescer('test'), [1, 2, 3], execute, window=1, max_batch=3)
+
+    assert sum(isinstance(e, SystemExit) for e in outcomes.values()) == 1
+    assert sum(isinstance(e, RuntimeError) for e in outcomes.values()) == 2
+
+
+def test_follower_wait_is_bounded():
+    coalescer = Coalescer('test')
+    release = threading.Event()
+
+    def execute(key, payloads):
+        release.wait(5)
+        return list(payloads)
+
+    leader = threading.Thread(target=coalescer.submit, args=('k', 1, execute), kwargs={'window': 5, 'max_batch': 2})
+    leader.start()
+    try:
+        # 等 leader 开好这一批；第二个提交让批次满员，leader 开始执行并卡在 release 上
+        deadline = time.monotonic() + 5
+        while 'k' not in coalescer._open and time.monotonic() < deadline:
+            time.sleep(0.001)
+        with pytest.raises(TimeoutError):
+            coalescer.submit('k', 2, execute, window=0, max_batch=2, timeout=0.1)
+    finally:
+        release.set()
+        leader.join(5)
@@ -0,0 +1,44 @@
+from app import counters, db
+from app.models import Category, Supplier
+
+
+def _stats(app, model, pk):
+    with app.app_context():
+        row = model.query.get(pk)
+        return row.product_count, row.total_stock
+
+
+def test_counters_follow_product_lifecycle(app, client):
+    with app.app_context():
+        db.session.add_all([Category(category_name='a'), Category(category_name='b'), Supplier(supplier_name='s')])
+        db.session.commit()
+
+    resp = client.post('/api/products', json={
+        'product_code': 'P1', 'product_name': 'p', 'category_id': 1, 'supplier_id': 1,
+        'purchase_price': 2, 'sale_price': 3,
+    })
+    product_id = resp.json['data']['product_id']
+    assert _stats(app, Category, 1) == (1, 0)
+
+    assert client.post('/api/stock/in', json={'product_id': product_id, 'quantity': 7, 'unit_price': 2}).json['code'] == 0
+    assert _stats(app, Category, 1) == (1, 7)
+    assert _stats(app, Supplier, 1) == (1, 7)
+
+    assert client.put(f'/api/products/{product_id}', json={'category_id': 2}).json['code'] == 0
+    assert _stats(app, Category, 1) == (0, 0)
+    assert _stats(app, Category, 2) == (1, 7)
+
+    # 有流水的商品只会被禁用，计数不变
+    assert client.delete(f'/api/products/{product_id}').json['code'] == 0
+    assert _stats(app, Category, 2) == (1, 7)
+
+    resp = client.post('/api/products', json={
+        'product_code': 'P2', 'product_name': 'p', 'category_id': 2, 'supplier_id': 1,
+        'purchase_price': 2, 'sale_price': 3,
+    })
+    assert client.delete(f'/api/products/{resp.json["data"]["product_id"]}').json['code'] == 0
+    assert _stats(app, Category, 2) == (1, 7)
+    assert _stats(app, Supplier, 1) == (1, 7)
+
+    with app.app_context():
+        assert counters.repair() == 0